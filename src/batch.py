@@ -0,0 +1,266 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from itertools import islice
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from board_gen import NaiveSolver, board_order
+from cache import SolutionCache
+from dlx import DLXSolver
+from logic import LogicSolver
+from reader import BoardReader, ReadError
+from sat import SATSolver
+
+SOLVERS = ("dlx", "logic", "sat", "naive")
+
+# per process solver name and cache size, set by _init_worker
+_solver_name = "dlx"
+_cache_size = 0
+# per process solvers for each order, made on first use so DLX links are reused between chunks
+_solvers: Dict[int, Any] = {}
+
+
+class BoardResult(NamedTuple):
+    """Outcome of solving one board from a batch"""
+
+    index: int
+    status: str  # "solved", "unsolvable" or "invalid"
+    seconds: float
+    board: List[List[int]]
+
+
+def to_int_board(board: List[List[Union[int, str]]]) -> List[List[int]]:
+    """Turn a read in board into ints
+
+    Digit strings become their value and template letters become their place in the alphabet,
+    so 'a' is 1. Anything else raises ValueError.
+
+    Parameters
+    ----------
+    board : List[List[int | str]]
+
+    Returns
+    -------
+    List[List[int]]
+    """
+    ret = []
+    for row in board:
+        new_row = []
+        for cell in row:
+            if isinstance(cell, str):
+                if cell.isdigit():
+                    cell = int(cell)
+                elif len(cell) == 1 and cell.isalpha():
+                    cell = ord(cell.lower()) - ord("a") + 1
+                else:
+                    raise ValueError(f"can't read cell {cell!r}")
+            new_row.append(cell)
+        ret.append(new_row)
+    return ret
+
+
+def _init_worker(solver: str, cache_size: int = 0) -> None:
+    global _solver_name, _cache_size
+    _solver_name, _cache_size = solver, cache_size
+    _solvers.clear()
+
+
+def _solver_for(order: int) -> Any:
+    solver = _solvers.get(order)
+    if solver is None:
+        if _solver_name == "dlx":
+            solver = DLXSolver(order)
+        elif _solver_name == "logic":
+            solver = LogicSolver(order)
+        elif _solver_name == "sat":
+            solver = SATSolver(order)
+        else:
+            solver = NaiveSolver
+        if _cache_size:
+            # one solver per worker process, so the cache can hand back the same one
+            solver = SolutionCache(lambda solver=solver: solver, _cache_size)
+        _solvers[order] = solver
+    return solver
+
+
+def _solve_chunk(
+    chunk: List[Tuple[int, List[List[Union[int, str]]]]],
+) -> List[BoardResult]:
+    results = []
+    for index, board in chunk:
+        start = time.perf_counter()
+        try:
+            table = to_int_board(board)
+        except ValueError:
+            results.append(BoardResult(index, "invalid", 0.0, board))
+            continue
+        order = board_order(table)
+        size = len(table)
+        if not table or order * order != size or any(len(row) != size for row in table):
+            results.append(BoardResult(index, "invalid", 0.0, table))
+            continue
+        solved = _solver_for(order).solve_board(table)
+        results.append(
+            BoardResult(
+                index,
+                "solved" if solved else "unsolvable",
+                time.perf_counter() - start,
+                table,
+            )
+        )
+    return results
+
+
+def iter_solve(
+    boards: Iterable[List[List[Union[int, str]]]],
+    workers: int = None,
+    chunk_size: int = 64,
+    solver: str = "dlx",
+    cache_size: int = 0,
+) -> Iterator[BoardResult]:
+    """Solve a stream of boards across a process pool, yielding results in input order
+
+    Boards are sent in chunks and at most 2 chunks per worker are in flight at once,
+    so memory stays flat however long the stream is. Boards of any order can be mixed, each
+    worker keeps a solver for every order it sees. Use "sat" for 25x25 boards.
+
+    Parameters
+    ----------
+    boards : Iterable[List[List[int | str]]]
+        boards to solve, can be a lazy iterator such as a reader.BoardReader
+    workers : int, optional
+        number of processes, by default one per cpu
+    chunk_size : int, optional
+        boards sent to a worker at a time, by default 64
+    solver : str, optional
+        one of SOLVERS, by default "dlx"
+    cache_size : int, optional
+        solutions each worker keeps in a cache.SolutionCache, so repeated puzzles and
+        their symmetric copies are only solved once per worker, by default 0 for no cache
+
+    Yields
+    ------
+    BoardResult
+    """
+    if solver not in SOLVERS:
+        raise ValueError(f"unknown solver {solver!r}, expected one of {SOLVERS}")
+    workers = workers or os.cpu_count() or 1
+    numbered = enumerate(boards)
+    with multiprocessing.Pool(
+        workers, initializer=_init_worker, initargs=(solver, cache_size)
+    ) as pool:
+        pending: deque = deque()
+        while True:
+            chunk = list(islice(numbered, chunk_size))
+            if not chunk:
+                break
+            pending.append(pool.apply_async(_solve_chunk, (chunk,)))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+
+def solve_file(
+    in_file: str,
+    out_file: str,
+    workers: int = None,
+    chunk_size: int = 64,
+    solver: str = "dlx",
+    use_mmap: bool = False,
+    on_error: Optional[Callable[[ReadError], None]] = None,
+    cache_size: int = 0,
+) -> dict:
+    """Solve every board in a plaintext file and write one JSON line per board
+
+    Parameters
+    ----------
+    in_file : str
+        path to boards in a plaintext format read by reader.BoardReader
+    out_file : str
+        path to write results to, lines are in the same order as the input boards
+    workers : int, optional
+        number of processes, by default one per cpu
+    chunk_size : int, optional
+        boards sent to a worker at a time, by default 64
+    solver : str, optional
+        one of SOLVERS, by default "dlx"
+    use_mmap : bool, optional
+        memory-map the input file, by default False
+    on_error : Callable[[ReadError], None], optional
+        called with each malformed record in the input, by default None
+    cache_size : int, optional
+        solutions each worker keeps in a cache, by default 0 for no cache
+
+    Returns
+    -------
+    dict
+        count of boards for each status, and of malformed records that were skipped
+    """
+    reader = BoardReader(in_file, use_mmap=use_mmap, on_error=on_error)
+    counts = {"solved": 0, "unsolvable": 0, "invalid": 0}
+    with open(out_file, "w") as fp:
+        for result in iter_solve(reader, workers, chunk_size, solver, cache_size):
+            counts[result.status] += 1
+            fp.write(json.dumps(result._asdict()) + "\n")
+    counts["malformed"] = len(reader.errors)
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Solve a file of boards across all cores"
+    )
+    parser.add_argument("input", help="plaintext file of boards")
+    parser.add_argument("output", help="file to write JSON lines results to")
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    parser.add_argument("-c", "--chunk-size", type=int, default=64)
+    parser.add_argument("-s", "--solver", choices=SOLVERS, default="dlx")
+    parser.add_argument("--mmap", action="store_true", help="memory-map the input file")
+    parser.add_argument(
+        "--cache",
+        type=int,
+        default=0,
+        metavar="SIZE",
+        help="keep up to SIZE solutions per worker, for files with repeated puzzles",
+    )
+    args = parser.parse_args()
+
+    def report(err: ReadError) -> None:
+        print(f"{args.input}:{err.line}: {err.message}", file=sys.stderr)
+
+    start = time.perf_counter()
+    counts = solve_file(
+        args.input,
+        args.output,
+        args.workers,
+        args.chunk_size,
+        args.solver,
+        args.mmap,
+        report,
+        args.cache,
+    )
+    total = sum(counts.values()) - counts["malformed"]
+    print(
+        f"{total} boards in {time.perf_counter() - start:.2f}s - "
+        + ", ".join(f"{k}: {v}" for k, v in counts.items())
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from copy import deepcopy
+from typing import Callable, Dict, List, NamedTuple, Tuple
+
+from batch import to_int_board
+from board_gen import BeerGenerator, DiagonalGenerator, Generator, NaiveSolver
+from dlx import DLXSolver
+from logic import LogicSolver
+from sat import SATSolver
+from symmetry import random_transform
+
+BOARD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Boards")
+
+# transcribed from the images in Test_Boards
+TEST_BOARDS = {
+    "L2G-20050714": "530070000600195000098000060800060003400803001700020006060000280000419005000080079",
+    "hard_for_brute_force": "000000000000003085001020000000507000004000100090000000500000073002010000000040009",
+}
+
+# from Gordon Royle's list of 17 clue puzzles, each has a unique solution
+SEVENTEEN_CLUE = [
+    "000000010400000000020000000000050407008000300001090000300400200050100000000806000",
+    "000000010400000000020000000000050604008000300001090000300400200050100000000807000",
+    "000000012000035000000600070700000300000400800100000000000120000080000040050000600",
+    "000000012003600000000007000410020000000500300700000600280000040000300500000000000",
+    "000000012008030000000000040120500000000004700060000000507000300000620000000100000",
+]
+
+# EASY are templates of BeerGenerator at max_iter 5, HARD are minimal templates of
+# carve_board_template that DifficultyRater labels diabolical, both checked in so a change
+# to the generator doesn't change what the solvers are timed on
+EASY = [
+    "901208060738406201064010000300680405006904800802053009000060540605801397090507106",
+    "004230081000786204052491603100058020270604039040370006607529340905143000420067100",
+    "300040090051708460490163020140039257000010000765820019070452036013906840020080005",
+    "090200045240071000500940702070105083004892100180704050809027004000450031430008020",
+    "010000204070418530430200861053104790060805010024307650681002047047981020302000080",
+]
+HARD = [
+    "000000201004300690050100043700003062000020000390600004580009020049001800203000000",
+    "763000000058090200004800000002708060000060000090204800000003100007080690000000743",
+    "072056000061000400030070600040000000280907014000000080006090040004000820000240750",
+    "000007500003060000901020078000004103040109020109700000610070205000010700007200000",
+    "000000408064900007090043000672000000800709002000000176000180020300006780207000000",
+]
+
+# puzzle sets the naive backtracker takes minutes on, only timed with --slow
+SLOW_FOR_NAIVE = {"17-clue", "test:hard_for_brute_force"}
+
+MAX_ITERS = (1, 5, 20, 50)
+
+
+class Case(NamedTuple):
+    """A named set of boards in the fixed corpus"""
+
+    name: str
+    boards: List[List[List[int]]]
+
+
+def from_line(line: str) -> List[List[int]]:
+    return [[int(ch) for ch in line[i : i + 9]] for i in range(0, 81, 9)]
+
+
+def build_corpus(seed: int = 0, per_set: int = 5) -> List[Case]:
+    """Collect the fixed corpus of boards, the shuffled set comes out the same for the same seed
+
+    Parameters
+    ----------
+    seed : int, optional
+        seed for the shuffled 17 clue set, by default 0
+    per_set : int, optional
+        boards in the shuffled 17 clue set, by default 5
+
+    Returns
+    -------
+    List[Case]
+    """
+    cases = [Case("premade", [to_int_board(Generator.PREMADE_BOARD)])]
+    for path in sorted(glob.glob(os.path.join(BOARD_DIR, "*.txt"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        boards = [to_int_board(b) for b in Generator.iter_boards(path)]
+        cases.append(Case(f"file:{name}", boards))
+    for name, line in TEST_BOARDS.items():
+        cases.append(Case(f"test:{name}", [from_line(line)]))
+
+    cases.append(Case("easy", [from_line(line) for line in EASY]))
+    cases.append(Case("hard", [from_line(line) for line in HARD]))
+    # shuffle the known 17 clue puzzles through the symmetry group to get a seeded set
+    rng = random.Random(seed)
+    boards = []
+    for i in range(per_set):
+        base = from_line(SEVENTEEN_CLUE[i % len(SEVENTEEN_CLUE)])
+        boards.append(random_transform(rng=rng).apply(base))
+    cases.append(Case("17-clue", boards))
+    return cases
+
+
+def time_call(
+    func: Callable, setup: Callable[[], Tuple], repeat: int
+) -> Dict[str, float]:
+    """Time func(*setup()) repeat times, setup is not timed
+
+    Returns
+    -------
+    Dict[str, float]
+        runs and the min, mean, median and max seconds
+    """
+    times = []
+    for _ in range(repeat):
+        args = setup()
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return {
+        "runs": repeat,
+        "min": min(times),
+        "mean": statistics.mean(times),
+        "median": statistics.median(times),
+        "max": max(times),
+    }
+
+
+def run(seed: int = 0, repeat: int = 5, slow: bool = False) -> dict:
+    """Run the whole suite
+
+    Parameters
+    ----------
+    seed : int, optional
+        seed for the corpus and for every random step being timed, by default 0
+    repeat : int, optional
+        times to run each measurement, by default 5
+    slow : bool, optional
+        also time NaiveSolver on the sets it takes minutes on, by default False
+
+    Returns
+    -------
+    dict
+        meta data about the run and a list of results, ready for json
+    """
+    results = []
+
+    def record(target: str, case: str, timing: Dict[str, float], **extra) -> None:
+        results.append({"target": target, "case": case, **extra, **timing})
+        print(f"{target:<40} {case:<32} {timing['median']:.6f}s", file=sys.stderr)
+
+    def seeded(*args) -> Callable[[], Tuple]:
+        # reseed before each run so random choices are the same every time
+        def setup() -> Tuple:
+            random.seed(seed)
+            return deepcopy(args)
+
+        return setup
+
+    dlx = DLXSolver()
+    logic = LogicSolver()
+    sat = SATSolver()
+    for case in build_corpus(seed):
+        for i, board in enumerate(case.boards):
+            name = f"{case.name}[{i}]"
+            if slow or case.name not in SLOW_FOR_NAIVE:
+                record(
+                    "NaiveSolver.solve_board",
+                    name,
+                    time_call(NaiveSolver.solve_board, seeded(board), repeat),
+                )
+            record(
+                "DLXSolver.solve_board",
+                name,
+                time_call(dlx.solve_board, seeded(board), repeat),
+            )
+            record(
+                "LogicSolver.solve_board",
+                name,
+                time_call(logic.solve_board, seeded(board), repeat),
+            )
+            record(
+                "SATSolver.solve_board",
+                name,
+                time_call(sat.solve_board, seeded(board), repeat),
+            )
+
+            def choose_rest(grid: List[List[int]]) -> None:
+                BeerGenerator.choose_rest(grid, BeerGenerator.init_choices(grid))
+
+            record(
+                "BeerGenerator.choose_rest",
+                name,
+                time_call(choose_rest, seeded(board), repeat),
+            )
+
+    for cls in (BeerGenerator, DiagonalGenerator):
+        gen = cls()
+        record(
+            f"{cls.__name__}.generate_board",
+            "empty",
+            time_call(gen.generate_board, seeded(), repeat),
+        )
+
+    gen = BeerGenerator()
+    random.seed(seed)
+    solution = gen.generate_board()
+    for max_iter in MAX_ITERS:
+        record(
+            "BeerGenerator.generate_board_template",
+            f"max_iter={max_iter}",
+            time_call(gen.generate_board_template, seeded(solution, max_iter), repeat),
+            max_iter=max_iter,
+        )
+    record(
+        "BeerGenerator.carve_board_template",
+        "minimal",
+        time_call(gen.carve_board_template, seeded(solution), repeat),
+    )
+
+    return {
+        "meta": {
+            "seed": seed,
+            "repeat": repeat,
+            "slow": slow,
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Time the solvers and generators on a fixed corpus"
+    )
+    parser.add_argument("-o", "--output", help="write JSON here instead of stdout")
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    parser.add_argument(
+        "--slow", action="store_true", help="time NaiveSolver on the 17 clue sets too"
+    )
+    args = parser.parse_args()
+
+    report = run(args.seed, args.repeat, args.slow)
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(report, fp, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
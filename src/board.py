@@ -0,0 +1,174 @@
+from typing import Iterable, Iterator, List, Tuple, Union
+
+from board_util import board_order
+from logic import Layout, layout
+
+
+class View:
+    """Window onto some cells of a Board, such as a row, column or box, nothing is copied
+
+    Indexing reads and writes the board itself. Slicing returns a list, like slicing a row
+    of a list of lists, so row[:] is still a copy and row[:] = values writes through.
+    """
+
+    __slots__ = ("cells", "indices")
+
+    def __init__(self, cells: bytearray, indices: Tuple[int, ...]) -> None:
+        self.cells = cells
+        self.indices = indices
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[int, List[int]]:
+        if isinstance(i, slice):
+            cells = self.cells
+            return [cells[j] for j in self.indices[i]]
+        return self.cells[self.indices[i]]
+
+    def __setitem__(self, i: Union[int, slice], value) -> None:
+        if isinstance(i, slice):
+            indices = self.indices[i]
+            values = list(value)
+            if len(values) != len(indices):
+                raise ValueError(f"can't assign {len(values)} values to {len(indices)}")
+            for j, v in zip(indices, values):
+                self.cells[j] = v
+        else:
+            self.cells[self.indices[i]] = value
+
+    def __iter__(self) -> Iterator[int]:
+        cells = self.cells
+        return (cells[j] for j in self.indices)
+
+    def __eq__(self, other) -> bool:
+        try:
+            return list(self) == list(other)
+        except TypeError:
+            return NotImplemented
+
+    __hash__ = None  # type: ignore
+
+    def __repr__(self) -> str:
+        return f"View({list(self)})"
+
+    def count(self, value: int) -> int:
+        cells = self.cells
+        return sum(1 for j in self.indices if cells[j] == value)
+
+
+class Board:
+    """Sudoku board packed one byte per cell into a flat bytearray, row by row
+
+    Reads and writes like a list of lists, board[y][x], so it can be passed in place of one
+    to the solvers, generators and other functions taking a board of ints. board[y] is a
+    View of the row, and col, box and peers give the other units the same way, through the
+    index tables of logic.layout that every board of an order shares.
+    The cells of a 9x9 board take 81 bytes where a list of lists takes over 1.5KB, and
+    copy() is a single buffer copy. Each board[y] makes a View, so code that indexes cells in
+    a tight loop, such as NaiveSolver, should be handed tolist() and the result copied back.
+    """
+
+    __slots__ = ("order", "size", "cells")
+
+    def __init__(self, rows: Iterable[Iterable[int]] = None, order: int = None) -> None:
+        """
+        Parameters
+        ----------
+        rows : Iterable[Iterable[int]], optional
+            rows of ints with 0 for blanks, such as a list of lists or another Board,
+            by default an empty board
+        order : int, optional
+            box width, by default taken from the number of rows or 3 for an empty board
+
+        Raises
+        ------
+        ValueError
+            when the cells don't make a square board of that order, or a value is too big
+        """
+        if isinstance(rows, Board):
+            cells = rows.cells[:]
+        else:
+            rows = list(rows or ())
+            cells = bytearray()
+            for row in rows:
+                cells.extend(row)
+        if order is None:
+            order = board_order(rows) if rows else 3
+        size = order * order
+        if not cells:
+            cells = bytearray(size * size)
+        if len(cells) != size * size:
+            raise ValueError(f"{len(cells)} cells don't make an order {order} board")
+        if max(cells) > size:
+            raise ValueError(f"values on an order {order} board go up to {size}")
+        self.order = order
+        self.size = size
+        self.cells = cells
+
+    @property
+    def layout(self) -> Layout:
+        return layout(self.order)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, y: int) -> View:
+        return View(self.cells, layout(self.order).rows[y])
+
+    def __setitem__(self, y: int, values: Iterable[int]) -> None:
+        self[y][:] = values
+
+    def __iter__(self) -> Iterator[View]:
+        cells = self.cells
+        return (View(cells, row) for row in layout(self.order).rows)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Board):
+            return self.cells == other.cells
+        try:
+            return self.tolist() == [list(row) for row in other]
+        except TypeError:
+            return NotImplemented
+
+    __hash__ = None  # type: ignore
+
+    def __repr__(self) -> str:
+        return f"Board({self.tolist()})"
+
+    def __bytes__(self) -> bytes:
+        return bytes(self.cells)
+
+    def copy(self) -> "Board":
+        board = Board.__new__(Board)
+        board.order = self.order
+        board.size = self.size
+        board.cells = self.cells[:]
+        return board
+
+    __copy__ = copy
+
+    def __deepcopy__(self, memo: dict) -> "Board":
+        return self.copy()
+
+    def tolist(self) -> List[List[int]]:
+        size, cells = self.size, self.cells
+        return [list(cells[i : i + size]) for i in range(0, size * size, size)]
+
+    def count(self, value: int) -> int:
+        """Number of cells holding value, count(0) is the number of blanks"""
+        return self.cells.count(value)
+
+    def row(self, y: int) -> View:
+        return View(self.cells, layout(self.order).rows[y])
+
+    def col(self, x: int) -> View:
+        return View(self.cells, layout(self.order).cols[x])
+
+    def box(self, b: int) -> View:
+        """Box b, numbered row by row from the top left, its cells row by row"""
+        return View(self.cells, layout(self.order).boxes[b])
+
+    def peers(self, y: int, x: int) -> View:
+        """The cells sharing a row, column or box with [y][x]"""
+        return View(self.cells, layout(self.order).peers[y * self.size + x])
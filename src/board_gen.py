@@ -1,9 +1,22 @@
 import random
-from typing import List, Set, SupportsInt, Tuple, Union, overload
+from string import ascii_lowercase
+from typing import Iterator, List, Optional, Set, SupportsInt, Tuple, Union, overload
 import pickle
-from copy import deepcopy
 import os.path
 
+from board_util import board_order, load_pickled_boards
+from instrument import SolverObserver
+from reader import BoardReader
+from store import SUFFIX, TemplateStore
+from symmetry import canonical_form, random_transform, unique_boards
+
+
+def placeholders(size: int) -> List[str]:
+    """Letters standing in for the values 1 to size in a template, a to y at most"""
+    if size > len(ascii_lowercase):
+        raise ValueError(f"can't template a board with {size} values")
+    return list(ascii_lowercase[:size])
+
 
 class Generator:
     """Object to hold previously created boards and to create more from stored templates
@@ -23,24 +36,58 @@ class Generator:
         [0, 0, 0, "c", "a", "f", 0, "e", "i"],
     ]
 
-    def __init__(self, filename: str = None) -> None:
+    def __init__(
+        self, filename: str = None, rng: random.Random = None, order: int = 3
+    ) -> None:
         """
         Parameters
         ----------
         filename : str
-            location of the pickled boards file. 
-            If None or empty string, defaults to Boards/board.pkl and will create the default template
+            location of the pickled boards file, or of a binary store.TemplateStore.
+            A path ending in store.SUFFIX that doesn't exist yet starts a new store.
+            If None, empty string or another missing path, defaults to Boards/board.pkl
+            and will create the default template
+        rng : random.Random, optional
+            source of every random choice, give each process its own seeded one to get
+            the same boards on every run, by default the random module
+        order : int, optional
+            box width of the boards, a new store is made for it, by default 3
+
+        Raises
+        ------
+        ValueError
+            if the store at filename holds boards of another order
         """
-        if filename is None or not os.path.isfile(filename):
+        # the module itself when not given, so random.seed still applies
+        self.rng = random if rng is None else rng  # type: ignore
+        self.store = None
+        if filename and (
+            TemplateStore.is_store(filename)
+            or filename.endswith(SUFFIX)
+            and not os.path.exists(filename)
+        ):
+            self.board_file = filename
+            self.store = TemplateStore(filename, order)
+            if self.store.order != order:
+                raise ValueError(
+                    f"{filename} holds order {self.store.order} boards, not {order}"
+                )
+        elif filename is None or not os.path.isfile(filename):
             self.board_file = "src/Boards/board.pkl"
-            if not os.path.isfile(
-                self.board_file
-            ):  # someone using default shouldn't lose all stored data
+            # someone using default shouldn't lose all stored data,
+            # and nothing is written when not run from the repo root
+            board_dir = os.path.dirname(self.board_file)
+            if os.path.isdir(board_dir) and not os.path.isfile(self.board_file):
                 with open(self.board_file, "wb") as fp:
                     pickle.dump([self.PREMADE_BOARD], fp)
         else:
             self.board_file = filename
         self.boards = []  # type: ignore
+        # boards before this index have already been appended to the store
+        self.stored = 0
+        # canonical forms of self.boards[: self.indexed], see symmetry.canonicalize
+        self.seen: Set[Tuple[int, ...]] = set()
+        self.indexed = 0
 
     def templatize_board(self, board: List[List[int]]) -> None:
         """Takes a board and converts clues to string placeholders. Appends result to self.boards
@@ -51,8 +98,8 @@ class Generator:
             solvable board with clues
         """
         temp: List[List[Union[int, str]]] = []
-        holders = ["a", "b", "c", "d", "e", "f", "g", "h", "i"]
-        random.shuffle(holders)
+        holders = placeholders(len(board))
+        self.rng.shuffle(holders)
         d = {i: k for i, k in enumerate(holders, start=1)}
         for row in board:
             temp.append([d[k] if k != 0 else 0 for k in row])
@@ -61,33 +108,48 @@ class Generator:
     def create_board(self) -> List[List[int]]:
         """Randomly choose a template stored in self.boards and return a playable board
 
+        With a template store the choice is made across the store and the boards not yet
+        written to it, a stored template is read by its offset.
+        The template is copied through a random element of the sudoku symmetry group, see
+        symmetry.random_transform. Besides the labels it permutes rows within bands, columns
+        within stacks, the bands and stacks themselves and may transpose, so one 9x9
+        template gives about 1.2e12 different looking boards without solving anything.
+
         Returns
         -------
         list[list[int]]
             A board of ints
         """
-        board = random.choice(self.boards)
-        holders = ["a", "b", "c", "d", "e", "f", "g", "h", "i"]
-        random.shuffle(holders)
-        val_dict = {x: i for i, x in enumerate(holders, start=1)}
-        for i in range(9):  # board is 9x9
-            for j in range(9):
-                if isinstance(board[i][j], str):  # only non blanks are string
-                    board[i][j] = val_dict[board[i][j]]
-        return board
+        if self.store is not None:
+            i = self.rng.randrange(len(self.store) + len(self.boards) - self.stored)
+            if i < len(self.store):
+                board = self.store[i]
+            else:
+                board = self.boards[self.stored + i - len(self.store)]
+        else:
+            board = self.rng.choice(self.boards)
+        size = len(board)
+        transform = random_transform(
+            board_order(board), self.rng, symbols=placeholders(size)
+        )
+        return transform.apply(board)
 
     def load_board_file(self) -> None:
         """Loads the board stored in a pickled file to the object
         
         File location is stored in self.board_file from initialization.
-        Do not call unless file exists, should only need to output_boards at end of use
+        Do not call unless file exists, should only need to output_boards at end of use.
+        Nothing is loaded from a template store, create_board reads it directly.
+        Boards equivalent to one already held, up to relabeling and the sudoku symmetries,
+        are skipped by comparing canonical forms.
         """
+        if self.store is not None:
+            return
         try:
-            with open(self.board_file, "rb") as fp:
-                temp_boards = pickle.load(fp)
-            for b in temp_boards:
-                if b not in self.boards:
-                    self.boards.append(b)
+            temp_boards = load_pickled_boards(self.board_file)
+            self.seen.update(map(canonical_form, self.boards[self.indexed :]))
+            self.boards.extend(unique_boards(temp_boards, self.seen))
+            self.indexed = len(self.boards)
         except FileNotFoundError:
             print(
                 f"Error: file {self.board_file} does not exist. No boards were loaded"
@@ -95,7 +157,13 @@ class Generator:
 
     def output_boards(self) -> None:
         """Writes the board templates to stored board_file, in a pickled format
+
+        A template store only has the boards added since the last output appended to it.
         """
+        if self.store is not None:
+            self.store.extend(self.boards[self.stored :])
+            self.stored = len(self.boards)
+            return
         with open(self.board_file, "wb") as fp:
             pickle.dump(self.boards, fp)
 
@@ -108,15 +176,17 @@ class Generator:
         board : List[List[int]]
             board in list of lists format
         """
-        hline = "-" * 36
+        order = board_order(board)
+        width = len(str(len(board)))  # widest value, 9 or 25
+        hline = "-" * ((width + 2) * len(board) + 3 * order)
         print(hline)
-        for i in range(9):
-            if i % 3 == 0 and i > 0:
+        for i in range(len(board)):
+            if i % order == 0 and i > 0:
                 print(hline)
-            for j in range(9):
-                if j % 3 == 0 and j > 0:
+            for j in range(len(board)):
+                if j % order == 0 and j > 0:
                     print("  |", end="")
-                print(f"  {board[i][j]}", end="")
+                print(f"  {board[i][j]:>{width}}", end="")
             print()
         print(hline)
 
@@ -141,49 +211,68 @@ class Generator:
                     ret[line][item] = 0
         return ret
 
+    @staticmethod
+    def iter_boards(filename: str) -> Iterator[List[List[Union[int, str]]]]:
+        """Lazily read boards from a plaintext file, one board at a time
+
+        Boards can be 9 rows of 9 elements separated by a space, or one line of 81 characters.
+        Malformed boards are skipped, use reader.BoardReader directly to see them.
+
+        Parameters
+        ----------
+        filename : str
+            str representing path to plaintext file
+
+        Returns
+        -------
+        Iterator[List[List[str | int]]]
+        """
+        return iter(BoardReader(filename))
+
     def get_mul_boards(self, filename: str) -> None:
         """Read in boards from a given plaintext file to store in object
 
-        Board format in plain text should be - 9 rows of 9 elements separated by a space
+        Board format in plain text should be - 9 rows of 9 elements separated by a space,
+        or one line of 81 characters with . or 0 for blanks
 
         Parameters
         ----------
         filename : str
             str representing path to plaintext file
         """
-        with open(filename, "r") as file:
-            data = file.readlines()
-        all_boards = self.format_board(data)
-        for i in range(0, len(all_boards), 9):
-            self.boards.append(all_boards[i : i + 9])
+        self.boards.extend(self.iter_boards(filename))
 
 
 class NaiveSolver:
     """Simple backtracking solver that incrementally tries each value in a cell
 
-    Recursive and no object __init__
+    Keeps its own stack rather than recursing, and no object __init__. Works on any order
+    of board, but the search is only practical for 9x9. Use dlx.DLXSolver for 16x16 and
+    sat.SATSolver for 25x25, where sparse boards can keep DLX and LogicSolver going for
+    minutes.
     """
 
     @staticmethod
     def check_box(table: List[List[int]], i: int, j: int, cell_val: int) -> int:
-        box_row = i - i % 3
-        box_col = j - j % 3
-        for x in range(3):
-            for y in range(3):
+        order = board_order(table)
+        box_row = i - i % order
+        box_col = j - j % order
+        for x in range(order):
+            for y in range(order):
                 if cell_val == table[box_row + x][box_col + y]:
                     return 0
         return 1
 
     @staticmethod
     def check_row(table: List[List[int]], i: int, cell_val: int) -> int:
-        for x in range(9):
+        for x in range(len(table)):
             if cell_val == table[i][x]:
                 return 0
         return 1
 
     @staticmethod
     def check_column(table: List[List[int]], j: int, cell_val: int) -> int:
-        for y in range(9):
+        for y in range(len(table)):
             if cell_val == table[y][j]:
                 return 0
         return 1
@@ -197,45 +286,383 @@ class NaiveSolver:
         return None
 
     @staticmethod
-    def solve_board(table: List[List[int]]) -> bool:
-        """Recursive backtrack approach to solve an input sudoku board
+    def solve_board(table: List[List[int]], observer: SolverObserver = None) -> bool:
+        """Backtrack approach to solve an input sudoku board
 
         Parameters
         ----------
         table : List[List[int]]
             the sudoku board
+        observer : SolverObserver, optional
+            receives search events, see instrument.SolverStats, by default None
 
         Returns
         -------
         bool
             True on solved, False on failure
         """
-        blank = NaiveSolver.find_blank(table)
-        if blank:
-            row, col = blank
-        else:
-            # return being done with whole board
-            return True
-        for v in range(1, 10):
-            if (
-                NaiveSolver.check_box(table, row, col, v)
-                and NaiveSolver.check_row(table, row, v)
-                and NaiveSolver.check_column(table, col, v)
-            ):
-                table[col][row] = v
-                if NaiveSolver.solve_board(
-                    table
-                ):  # this creates the backtracking approach
+        if observer is None:
+            return NaiveSolver._solve(table, None)
+        with observer.phase("search"):
+            return NaiveSolver._solve(table, observer)
+
+    @staticmethod
+    def _solve(table: List[List[int]], observer: SolverObserver) -> bool:
+        # blanks filled so far, deepest last, their values are kept in table
+        stack: List[Tuple[int, int]] = []
+        size = len(table)
+        descend = True
+        while True:
+            if descend:
+                if observer is not None:
+                    observer.enter(len(stack))
+                blank = NaiveSolver.find_blank(table)
+                if not blank:
+                    # return being done with whole board
                     return True
-                table[col][row] = 0
-        return False
+                row, col = blank
+                v = 1
+            else:
+                # every value of the deepest blank failed, go back to the one before
+                if not stack:
+                    return False
+                row, col = stack.pop()
+                v = table[row][col]
+                table[row][col] = 0
+                if observer is not None:
+                    observer.backtrack(row, col, v, len(stack))
+                v += 1
+            descend = False
+            while v <= size:
+                if (
+                    NaiveSolver.check_box(table, row, col, v)
+                    and NaiveSolver.check_row(table, row, v)
+                    and NaiveSolver.check_column(table, col, v)
+                ):
+                    table[row][col] = v
+                    if observer is not None:
+                        observer.place(row, col, v, len(stack))
+                    stack.append((row, col))
+                    descend = True
+                    break
+                elif observer is not None:
+                    observer.eliminate(1)
+                v += 1
+
+
+class FreedomMask:
+    """Bitmask replacement for the grid of freedom sets
+
+    Bit v of a mask is set when value v is used. One int is kept per row, column and box,
+    so placing or removing a value is O(1) and a search can undo a move instead of copying.
+    Memory grows with the side of the board rather than its cells, 75 ints for 25x25.
+    """
+
+    __slots__ = ("order", "size", "full", "rows", "cols", "boxes", "legal")
+
+    def __init__(self, grid: List[List[int]], order: int = 3) -> None:
+        """
+        Parameters
+        ----------
+        grid : List[List[int]]
+            board to build the masks from, 0 for blanks
+        order : int, optional
+            box width of the board, by default 3
+        """
+        self.order = order
+        self.size = order * order
+        self.full = ((1 << self.size) - 1) << 1  # bits 1..size
+        self.rows = [0] * self.size
+        self.cols = [0] * self.size
+        self.boxes = [0] * self.size
+        # set False when a value is repeated in a row, column or box
+        self.legal = True
+        for y in range(len(grid)):
+            for x in range(len(grid[y])):
+                if grid[y][x] != 0:
+                    if not self.free(y, x) & (1 << grid[y][x]):
+                        self.legal = False
+                    self.place(y, x, grid[y][x])
+
+    def box(self, y: int, x: int) -> int:
+        return (y // self.order) * self.order + x // self.order
+
+    def free(self, y: int, x: int) -> int:
+        """Mask of values that can still go in cell [y][x]"""
+        return self.full & ~(self.rows[y] | self.cols[x] | self.boxes[self.box(y, x)])
+
+    def place(self, y: int, x: int, val: int) -> None:
+        bit = 1 << val
+        self.rows[y] |= bit
+        self.cols[x] |= bit
+        self.boxes[self.box(y, x)] |= bit
+
+    def remove(self, y: int, x: int, val: int) -> None:
+        bit = ~(1 << val)
+        self.rows[y] &= bit
+        self.cols[x] &= bit
+        self.boxes[self.box(y, x)] &= bit
+
+    def propagate(
+        self, blanks: List[Tuple[int, int]]
+    ) -> Tuple[List[Tuple[int, int, int]], List[Tuple[int, int]], int]:
+        """Place every forced move, then pick the blank a search should branch on
+
+        A blank with one choice left, or a value with one place left in its row, column or
+        box, is a forced move. Every forced move found in a pass over the blanks is placed
+        before the next pass, so a search visits one node per pass instead of one per cell.
+        Once nothing is forced the blank with the fewest choices is picked.
+
+        Parameters
+        ----------
+        blanks : List[Tuple[int, int]]
+            (y, x) of every blank cell, left unchanged
+
+        Returns
+        -------
+        Tuple[List[Tuple[int, int, int]], List[Tuple[int, int]], int]
+            (y, x, val) of the forced moves placed, for the caller to remove when it
+            backtracks. The blanks left, with the one to branch on last, and the mask of
+            values to try there. A mask of 0 with blanks left means some cell or value has
+            no place left, nothing is placed then and the search has to backtrack.
+        """
+        size, order, full = self.size, self.order, self.full
+        rows, cols, boxes = self.rows, self.cols, self.boxes
+        moves: List[Tuple[int, int, int]] = []
+        rest = list(blanks)
+        while rest:
+            # free mask and unit indices of each blank, units run rows, cols then boxes
+            cells = []
+            forced = {}
+            index, best, score = -1, 0, size + 1
+            for i, (y, x) in enumerate(rest):
+                b = (y // order) * order + x // order
+                free = full & ~(rows[y] | cols[x] | boxes[b])
+                if not free & (free - 1):
+                    if not free:
+                        break
+                    forced[i] = free
+                elif not forced:
+                    n = bin(free).count("1")
+                    if n < score:
+                        index, best, score = i, free, n
+                cells.append((free, y, size + x, 2 * size + b))
+            else:
+                # values that fit once and more than once in each unit
+                once = [0] * (3 * size)
+                twice = [0] * (3 * size)
+                for free, r, c, b in cells:
+                    twice[r] |= once[r] & free
+                    once[r] |= free
+                    twice[c] |= once[c] & free
+                    once[c] |= free
+                    twice[b] |= once[b] & free
+                    once[b] |= free
+                used = rows + cols + boxes
+                for u in range(3 * size):
+                    if full & ~(used[u] | once[u]):
+                        break  # a value that fits nowhere in the unit
+                    once[u] &= ~twice[u]
+                else:
+                    for i, (free, r, c, b) in enumerate(cells):
+                        only = free & (once[r] | once[c] | once[b])
+                        if only:
+                            forced[i] = forced.get(i, 0) | only
+                    if not forced:
+                        rest[index], rest[-1] = rest[-1], rest[index]
+                        return moves, rest, best
+                    for i, bit in forced.items():
+                        y, x = rest[i]
+                        # two values forced into one cell, or one value into two
+                        # cells of a unit, can't both fit
+                        if bit & (bit - 1) or not bit & self.free(y, x):
+                            break
+                        val = bit.bit_length() - 1
+                        self.place(y, x, val)
+                        moves.append((y, x, val))
+                    else:
+                        rest = [cell for i, cell in enumerate(rest) if i not in forced]
+                        continue
+            # dead end, take back what was placed
+            for y, x, val in moves:
+                self.remove(y, x, val)
+            return [], blanks, 0
+        return moves, rest, 0
+
+    @staticmethod
+    def values(mask: int) -> List[int]:
+        """Unpack a mask into the list of values it holds"""
+        vals = []
+        v = 1
+        mask >>= 1
+        while mask:
+            if mask & 1:
+                vals.append(v)
+            mask >>= 1
+            v += 1
+        return vals
+
+    @staticmethod
+    def count(mask: int) -> int:
+        return bin(mask).count("1")
+
+
+def _search(
+    grid: List[List[int]],
+    freedom: FreedomMask,
+    blanks: List[Tuple[int, int]],
+    budget: List[int] = None,
+    rng: random.Random = None,
+    observer: SolverObserver = None,
+    limit: int = None,
+) -> Iterator[List[List[int]]]:
+    """Depth first search over the blanks of grid, yields grid each time it is full
+
+    The search keeps an explicit stack of frames instead of recursing, so it isn't bound by
+    the recursion limit and can be suspended at any solution. Moves are made on grid and
+    freedom and undone when backtracking, so once the search runs out both are back as they
+    started. A caller that stops early is left with the last solution in grid, pass limit
+    to have the moves taken back after that many solutions instead.
+
+    Parameters
+    ----------
+    grid : List[List[int]]
+        board to fill in place, 0 for blanks
+    freedom : FreedomMask
+        masks built from grid, see BeerGenerator.init_choices
+    blanks : List[Tuple[int, int]]
+        (y, x) of every blank cell of grid
+    budget : List[int], optional
+        one item list of the most search nodes to visit, counted down as they are visited.
+        Below 0 afterwards when the search stopped for lack of nodes, by default no limit
+    rng : random.Random, optional
+        try the values of a blank in an order shuffled by rng, by default ascending
+    observer : SolverObserver, optional
+        receives search events, see instrument.SolverStats, by default None
+    limit : int, optional
+        most solutions to yield, by default no limit
+
+    Yields
+    ------
+    List[List[int]]
+        grid itself, full, valid until the search is resumed
+    """
+    # each frame is the forced moves of a node, the blank it branches on, the values left
+    # to try there and the blanks below it
+    stack: List[Tuple[list, Optional[Tuple[int, int]], List[int], list]] = []
+    found = 0
+    # set once out of nodes or past the limit, every frame is then taken back
+    stop = False
+    descend = True
+    while True:
+        if descend:
+            depth = len(stack)
+            if budget is not None:
+                budget[0] -= 1
+                stop = budget[0] < 0
+            if not stop:
+                if observer is not None:
+                    observer.enter(depth)
+                # place the forced moves, then find the blank with the least freedom
+                moves, rest, best = freedom.propagate(stack[-1][3] if stack else blanks)
+                for y, x, v in moves:
+                    grid[y][x] = v
+                if observer is not None:
+                    for y, x, v in moves:
+                        observer.place(y, x, v, depth)
+                    # values ruled out of the chosen cell
+                    observer.eliminate(
+                        freedom.size - freedom.count(best) if rest else 0
+                    )
+                cell = None
+                choices: List[int] = []
+                if rest and best:
+                    cell = rest.pop()
+                    choices = freedom.values(best)
+                    if rng is not None:
+                        rng.shuffle(choices)
+                    # tried from the end
+                    choices.reverse()
+                stack.append((moves, cell, choices, rest))
+                if not rest:
+                    yield grid
+                    found += 1
+                    stop = found == limit
+        if not stack:
+            return
+        moves, cell, choices, rest = stack[-1]
+        depth = len(stack) - 1
+        if cell is not None:
+            y, x = cell
+            if grid[y][x]:
+                v = grid[y][x]
+                freedom.remove(y, x, v)
+                grid[y][x] = 0
+                if observer is not None:
+                    observer.backtrack(y, x, v, depth)
+            if choices and not stop:
+                v = choices.pop()
+                grid[y][x] = v
+                freedom.place(y, x, v)
+                if observer is not None:
+                    observer.place(y, x, v, depth)
+                descend = True
+                continue
+        # every choice here is spent, undo the forced moves and go back up
+        stack.pop()
+        for y, x, v in reversed(moves):
+            grid[y][x] = 0
+            freedom.remove(y, x, v)
+            if observer is not None:
+                observer.backtrack(y, x, v, depth)
+        descend = False
+
+
+def iter_solutions(
+    board: List[List[int]], nodes: int = None
+) -> Iterator[List[List[int]]]:
+    """Lazily yield every solution of a board
+
+    The search only runs while the next solution is asked for, so it can be paused between
+    solutions, resumed, or dropped at any point without cleaning up. Take the first with
+    next(), the first k with itertools.islice, or all of them with list().
+    Works on any order of board, values are tried in ascending order so the solutions
+    always come out in the same order.
+
+    Parameters
+    ----------
+    board : List[List[int]]
+        board to solve, 0 for blanks, left unchanged
+    nodes : int, optional
+        most search nodes to visit before stopping, by default no limit
+
+    Yields
+    ------
+    List[List[int]]
+        a new board for each solution
+    """
+    grid = [list(row) for row in board]
+    freedom = FreedomMask(grid, board_order(grid))
+    if not freedom.legal:
+        return
+    blanks = [
+        (y, x) for y in range(len(grid)) for x in range(len(grid[y])) if grid[y][x] == 0
+    ]
+    budget = None if nodes is None else [nodes]
+    for solution in _search(grid, freedom, blanks, budget):
+        yield [row[:] for row in solution]
 
 
 class BeerGenerator(Generator):
     ORDER = 3  # store like this to allow scaling up to 'larger' sudoku
-    FULL_SET = set([i for i in range(1, 10)])
-
-    def __init__(self, filename: str = None) -> None:
+    SIZE = ORDER * ORDER
+    FULL_SET = set([i for i in range(1, SIZE + 1)])
+    # search nodes per blank before choose_rest starts over
+    RESTART_NODES = 4
+
+    def __init__(
+        self, filename: str = None, order: int = None, rng: random.Random = None
+    ) -> None:
         """create a sudoku board generator that uses Daniel Beer's methodology
 
         This is created following Daniel Beer's algorithm, 
@@ -250,12 +677,22 @@ class BeerGenerator(Generator):
         ----------
         filename : str, optional
             file path to read in board data from, or where to store it, by default None
+        order : int, optional
+            box width of the boards to make, 4 for 16x16 and 5 for 25x25, by default ORDER
+        rng : random.Random, optional
+            source of every random choice, by default the random module
         """
-        super().__init__(filename=filename)
+        super().__init__(
+            filename=filename, rng=rng, order=self.ORDER if order is None else order
+        )
+        if order is not None:
+            self.ORDER = order
+            self.SIZE = order * order
+            self.FULL_SET = set(range(1, self.SIZE + 1))
 
     @classmethod
     def get_board_diffic(
-        cls, board: List[List[int]], freedom: List[List[Set[int]]] = None
+        cls, board: List[List[int]], freedom: FreedomMask = None
     ) -> int:
         """Calculate board difficulty, usually used on unsolved boards
 
@@ -265,8 +702,8 @@ class BeerGenerator(Generator):
         ----------
         board : List[List[int]]
             board to find difficulty of
-        freedom : List[List[Set[int]]], optional
-            List of sets containing choices for each cell, by default None
+        freedom : FreedomMask, optional
+            masks of the used values for the board, by default None
 
         Returns
         -------
@@ -275,9 +712,12 @@ class BeerGenerator(Generator):
         if freedom is None:
             freedom = cls.init_choices(board)
         diff = 0
-        for row in freedom:
-            for st in row:
-                diff += len(st) ** 2
+        for y in range(len(board)):
+            for x in range(len(board[y])):
+                if board[y][x] == 0:
+                    diff += freedom.count(freedom.free(y, x)) ** 2
+                else:
+                    diff += 1  # a filled cell has exactly one choice
         return diff
 
     def generate_board_template(self, solution: List[List[int]], max_iter: int):
@@ -285,7 +725,8 @@ class BeerGenerator(Generator):
         
         Will append to self.boards. Either removes clues on the board or adds a pair back in. 
         Increasing max_iter will make a more difficult puzzle. 
-        # TODO: verify that a board is uniquely solvable after a cycle else return
+        A removal is undone if the board would no longer be uniquely solvable, or if that
+        can't be shown within one search node per cell, which only happens on large boards.
 
         Parameters
         ----------
@@ -294,31 +735,133 @@ class BeerGenerator(Generator):
         max_iter : int
             how many cycles of revisions should a board go through
         """
-        board = deepcopy(solution)
+        board = [list(row) for row in solution]
+        size = len(board)
+        last = size - 1
         for _ in range(max_iter):
-            problem = deepcopy(board)
             for _ in range(20):
-                s = random.randint(0, 80)
-                r, c = s // 9, s % 9
+                s = self.rng.randint(0, size * size - 1)
+                r, c = s // size, s % size
                 # flip a coin on removing a pair of values, or adding them in
-                if random.random() < 0.5:
-                    problem[r][c] = 0
-                    problem[8 - r][8 - c] = 0
+                if self.rng.random() < 0.5:
+                    saved = board[r][c], board[last - r][last - c]
+                    board[r][c] = 0
+                    board[last - r][last - c] = 0
+                    if self.count_solutions(board, nodes=size * size) != 1:
+                        board[r][c], board[last - r][last - c] = saved
                 else:
-                    problem[r][c] = solution[r][c]
-                    problem[8 - r][8 - c] = solution[8 - r][8 - c]
-                choices = self.init_choices(problem)
-                if self.is_legal_board(problem, choices):
-                    test = deepcopy(problem)
-                    if self.choose_rest(test, choices) == 0:
-                        board = problem
+                    # adding clues back can't make the solution ambiguous
+                    board[r][c] = solution[r][c]
+                    board[last - r][last - c] = solution[last - r][last - c]
+        self.templatize_board(board)
+
+    def carve_board_template(
+        self,
+        solution: List[List[int]],
+        clues: int = None,
+        difficulty: int = None,
+        nodes: int = None,
+    ):
+        """Make a new board template by taking clues out of a solved board one pair at a time
+
+        Will append to self.boards. Each symmetric pair of clues is tried once, in random
+        order, and put back if the board would no longer be uniquely solvable, or if that
+        can't be shown within nodes search nodes. The masks and blanks of the board
+        are kept between tries and only the pair being tried changes, so nothing is rebuilt.
+        Without a target this carves until no pair can go, which is about as hard as this
+        board gets.
+
+        Parameters
+        ----------
+        solution : List[List[int]]
+            solved board to generate an unsolved board from
+        clues : int, optional
+            stop once the board has this many clues or fewer, by default no target
+        difficulty : int, optional
+            stop once get_board_diffic reaches this, by default no target
+        nodes : int, optional
+            search nodes each pair may use, 1 only takes out clues that singles still find,
+            by default one per cell for 16x16 and smaller boards and 1 for larger ones
+        """
+        board = [list(row) for row in solution]
+        size = len(board)
+        cells = size * size
+        if nodes is None:
+            # searching a 25x25 board a node per cell for every pair takes minutes and
+            # leaves hardly fewer clues than singles alone
+            nodes = cells if size <= 16 else 1
+        freedom = self.init_choices(board)
+        blanks: List[Tuple[int, int]] = []
+        # one cell of each pair, the center cell of an odd board is its own pair
+        pairs = [s for s in range(cells) if s <= cells - 1 - s]
+        self.rng.shuffle(pairs)
+        left = cells
+        for s in pairs:
+            if clues is not None and left <= clues:
+                break
+            if (
+                difficulty is not None
+                and self.get_board_diffic(board, freedom) >= difficulty
+            ):
+                break
+            pair = [divmod(s, size)]
+            if s != cells - 1 - s:
+                pair.append(divmod(cells - 1 - s, size))
+            for y, x in pair:
+                freedom.remove(y, x, board[y][x])
+                board[y][x] = 0
+                blanks.append((y, x))
+            budget = [nodes]
+            found = sum(1 for _ in _search(board, freedom, blanks, budget, limit=2))
+            if found == 1 and budget[0] >= 0:
+                left -= len(pair)
+            else:
+                for y, x in pair:
+                    board[y][x] = solution[y][x]
+                    freedom.place(y, x, board[y][x])
+                del blanks[-len(pair) :]
         self.templatize_board(board)
 
     @classmethod
-    def init_choices(cls, grid: List[List[int]]) -> List[List[Set[int]]]:
+    def count_solutions(
+        cls, board: List[List[int]], limit: int = 2, nodes: int = None
+    ) -> int:
+        """Count the solutions of a board, stopping the search once limit are found
+
+        Parameters
+        ----------
+        board : List[List[int]]
+            board to count solutions of, left unchanged
+        limit : int, optional
+            most solutions to look for, by default 2 which is enough to test uniqueness
+        nodes : int, optional
+            most search nodes to visit before giving up, by default no limit
+
+        Returns
+        -------
+        int
+            number of solutions found, at most limit, or -1 when nodes ran out first
+        """
+        grid = [list(row) for row in board]
+        freedom = cls.init_choices(grid)
+        if not cls.is_legal_board(grid, freedom):
+            return 0
+        blanks = [
+            (y, x)
+            for y in range(len(grid))
+            for x in range(len(grid[y]))
+            if grid[y][x] == 0
+        ]
+        budget = None if nodes is None else [nodes]
+        found = sum(1 for _ in _search(grid, freedom, blanks, budget, limit=limit))
+        return -1 if budget is not None and budget[0] < 0 else found
+
+    @classmethod
+    def init_choices(cls, grid: List[List[int]]) -> FreedomMask:
         """initialize the possible values for all cells in a grid
 
-        Cells that have been filled in already will be demarked by a set containing only that value.
+        Choices for a cell are the values not yet used in its row, column or box.
+        The order is taken from the size of the grid.
 
         Parameters
         ----------
@@ -327,113 +870,112 @@ class BeerGenerator(Generator):
 
         Returns
         -------
-        List[List[Set[int]]]
+        FreedomMask
         """
-        freedom = [[cls.FULL_SET.copy() for _ in range(9)] for _ in range(9)]
-        for y in range(len(grid)):
-            for x in range(len(grid[y])):
-                if grid[y][x] != 0:
-                    cls.remove_freedom(freedom, x, y, grid[y][x])
-        return freedom
+        return FreedomMask(grid, board_order(grid))
 
     @classmethod
-    def remove_freedom(cls, freedom: List[List[set]], x: int, y: int, val: int):
+    def remove_freedom(cls, freedom: FreedomMask, x: int, y: int, val: int):
         """Change the freedom based on adding val to the cell at position [y][x]
 
-        Restores original state of cell [y][x] at end, so every cell will have at least 1 choice
-
         Parameters
         ----------
-        freedom : List[List[set]]
-            List of lists containing the freedoms for each cell
+        freedom : FreedomMask
+            masks of the used values for each row, column and box
         x : int
         y : int
         val : int
             value to be inserted
         """
-        saved = freedom[y][x].copy()
-        # remove from column
-        for i in range(cls.ORDER ** 2):
-            freedom[i][x].discard(val)
-
-        # remove from row
-        for i in range(cls.ORDER ** 2):
-            freedom[y][i].discard(val)
-
-        # remove from box
-        start_row = y - y % cls.ORDER
-        start_col = x - x % cls.ORDER
-        for i in range(start_row, start_row + cls.ORDER):
-            for j in range(start_col, start_col + cls.ORDER):
-                freedom[i][j].discard(val)
-        freedom[y][x] = saved
+        freedom.place(y, x, val)
 
     @classmethod
-    def is_legal_board(cls, grid: List[List[int]], freedom: List[List[set]]) -> bool:
+    def is_legal_board(cls, grid: List[List[int]], freedom: FreedomMask) -> bool:
         """Labeled as a sanity checker, usually to make sure a board is solvable
 
-        Makes sure that each filled in cell has its value in the appropriate freedom cell.
-        If a cell's freedom set doesn't contain the value it is, then there is a reused value issue making it unsolvable.
+        A value reused in a row, column or box makes the board unsolvable,
+        this is recorded on the masks when they are built from the grid.
 
         Parameters
         ----------
         grid : List[List[int]]
-        freedom : List[List[set]]
+        freedom : FreedomMask
 
         Returns
         -------
         bool
             True/False to answer whether it is solvable or not
         """
-        for y in range(len(grid)):
-            for x in range(len(grid[y])):
-                if grid[y][x] != 0 and grid[y][x] not in freedom[y][x]:
-                    return False
-        return True
+        return freedom.legal
 
     @classmethod
-    def choose_rest(cls, grid: List[List[int]], freedom: List[List[set]]) -> int:
-        """Recursively solve grid, allows backtracking
+    def choose_rest(
+        cls,
+        grid: List[List[int]],
+        freedom: FreedomMask,
+        observer: SolverObserver = None,
+        rng: random.Random = None,
+    ) -> int:
+        """Solve grid in place, allows backtracking
+
+        Makes every forced move first, then fills the blank with the fewest choices and picks
+        randomly between the choices, see FreedomMask.propagate.
+        Moves are undone on the masks when backtracking, nothing is copied.
+        Random choices sometimes lead into a long dead end on large boards, so the search
+        starts over when it runs out of nodes, with twice as many each time.
 
         Parameters
         ----------
         grid : List[List[int]]
-        freedom : List[List[set]]
+        freedom : FreedomMask
+            masks built from grid, see init_choices
+        observer : SolverObserver, optional
+            receives search events, see instrument.SolverStats, by default None
+        rng : random.Random, optional
+            source of the random choices, by default the random module
 
         Returns
         -------
         int
             0 on completion, -1 on errors
         """
+        if rng is None:
+            rng = random  # type: ignore
+        if observer is None:
+            blanks = [
+                (y, x)
+                for y in range(len(grid))
+                for x in range(len(grid[y]))
+                if grid[y][x] == 0
+            ]
+            return 0 if cls._restart(grid, freedom, blanks, rng) else -1
+        with observer.phase("setup"):
+            blanks = [
+                (y, x)
+                for y in range(len(grid))
+                for x in range(len(grid[y]))
+                if grid[y][x] == 0
+            ]
+        with observer.phase("search"):
+            return 0 if cls._restart(grid, freedom, blanks, rng, observer) else -1
 
-        def least_free(grid, freedom: List[List[set]]) -> Tuple[int, int]:
-            index = -1, -1
-            score = 0
-            for i in range(len(grid)):
-                for j, cell_val in enumerate(grid[i]):
-                    if cell_val == 0:
-                        if score == 0 or score > len(freedom[i][j]):
-                            index = (i, j)
-                            score = len(freedom[i][j])
-            return index
-
-        ind_y, ind_x = least_free(grid, freedom)
-        if ind_x < 0 or ind_y < 0:
-            return 0
-        # need a copy or it gets overwritten in later recursive calls
-        current = freedom[ind_y][ind_x].copy()
-        while len(current) > 0:
-            # need this special function to make copy of each set in list
-            new_free = deepcopy(freedom)
-            v = random.choice(list(current))
-            current.remove(v)
-            grid[ind_y][ind_x] = v
-            cls.remove_freedom(new_free, ind_x, ind_y, v)
-
-            if cls.choose_rest(grid, new_free) == 0:
-                return 0
-        grid[ind_y][ind_x] = 0
-        return -1
+    @classmethod
+    def _restart(
+        cls,
+        grid: List[List[int]],
+        freedom: FreedomMask,
+        blanks: List[Tuple[int, int]],
+        rng: random.Random,
+        observer: SolverObserver = None,
+    ) -> bool:
+        nodes = cls.RESTART_NODES * (len(blanks) + 1)
+        while True:
+            budget = [nodes]
+            for _ in _search(grid, freedom, blanks, budget, rng, observer):
+                return True
+            if budget[0] >= 0:
+                return False
+            nodes *= 2
 
     def choose_box1(self, grid: List[List[int]]) -> None:
         """Fill in place the first box, starting in upper left hand corner of the grid
@@ -448,55 +990,56 @@ class BeerGenerator(Generator):
         box1 = self.FULL_SET.copy()
         for i in range(self.ORDER):
             for j in range(self.ORDER):
-                v = random.choice(list(box1))
+                v = self.rng.choice(list(box1))
                 box1.remove(v)
                 grid[i][j] = v
 
     def choose_box2(self, grid: List[List[int]]) -> None:
-        """Fill in place the second box, upper row - middle column
+        """Fill in place the middle boxes of the top band, upper row - middle columns
 
-        For each box-row, stores the used values from the previous box then chooses a value
-        from the other 2 box-rows.
+        For each box, stores the values each box-row has used in the boxes to its left, then
+        gives every value to one of the box-rows that hasn't used it. Values with the fewest
+        box-rows left are given out first and the box is started again on a dead end.
+        For 9x9 this is only the second box.
 
         Parameters
         ----------
         grid : List[List[int]]
             board that has only the first box filled in
         """
-        rows: List[Set[int]] = [set() for _ in range(self.ORDER)]
-        choose: List[Set[int]] = [set() for _ in range(self.ORDER)]
-        for i in range(self.ORDER):
-            for el in grid[i][:3]:
-                rows[i].add(el)
-        # randomly choose 3 element for first box-row from the 6 possible elements
-        free_set = rows[1].union(rows[2])
-        for i in range(self.ORDER):
-            v = random.choice(list(free_set))
-            choose[0].add(v)
-            free_set.remove(v)
-        # make sure each doesn't reuse a value
-        # middle_set = (rows[0] | rows[2]) - choose[0]
-        # last_set = (rows[0] | rows[1]) - choose[0]
-        middle_set = rows[0].union(rows[2]).difference(choose[0])
-        last_set = rows[0].union(rows[1]).difference(choose[0])
-        while len(last_set) > 3:
-            v = random.choice(list(middle_set))
-            choose[1].add(v)
-            middle_set.remove(v)
-            last_set.discard(v)  # discard throws no error if v doesn't exist
-        # choose[1] = choose[1] | (middle_set - last_set)
-        choose[1] = choose[1].union(middle_set.difference(last_set))
-        choose[2] = last_set.copy()
-        # slice assignment for speed
-        for i in range(self.ORDER):
-            l_choose = list(choose[i])
-            random.shuffle(l_choose)
-            grid[i][self.ORDER : 2 * self.ORDER] = l_choose
+        for box in range(1, self.ORDER - 1):
+            left = box * self.ORDER
+            while True:
+                rows = [self.FULL_SET.difference(grid[i][:left]) for i in range(self.ORDER)]
+                choose: List[List[int]] = [[] for _ in range(self.ORDER)]
+                values = list(self.FULL_SET)
+                self.rng.shuffle(values)
+                while values:
+                    # box-rows that could still take each value
+                    takers = {
+                        v: [
+                            i
+                            for i in range(self.ORDER)
+                            if v in rows[i] and len(choose[i]) < self.ORDER
+                        ]
+                        for v in values
+                    }
+                    v = min(values, key=lambda v: len(takers[v]))
+                    if not takers[v]:
+                        break
+                    choose[self.rng.choice(takers[v])].append(v)
+                    values.remove(v)
+                if not values:
+                    break
+            # slice assignment for speed
+            for i in range(self.ORDER):
+                self.rng.shuffle(choose[i])
+                grid[i][left : left + self.ORDER] = choose[i]
 
     def choose_box3(self, grid: List[List[int]]) -> None:
-        """fill in the last box of the top row, needs to have other 2 boxes filled in
+        """fill in the last box of the top row, needs to have the other boxes filled in
 
-        For each row, finds remaining 3 elements available and randomly chooses location
+        For each row, finds remaining ORDER elements available and randomly chooses location
 
         Parameters
         ----------
@@ -505,11 +1048,11 @@ class BeerGenerator(Generator):
         """
         for i in range(self.ORDER):
             avail = self.FULL_SET.copy()
-            for j in range(self.ORDER * 2):
+            for j in range(self.SIZE - self.ORDER):
                 avail.remove(grid[i][j])
             free = list(avail)
-            random.shuffle(free)
-            grid[i][self.ORDER * 2 : self.ORDER * self.ORDER] = free
+            self.rng.shuffle(free)
+            grid[i][self.SIZE - self.ORDER : self.SIZE] = free
 
     def choose_col(self, grid: List[List[int]]) -> None:
         """choose left hand column values, should be called after box 1 is filled
@@ -523,8 +1066,8 @@ class BeerGenerator(Generator):
         avail = self.FULL_SET.copy()
         for i in range(self.ORDER):
             avail.remove(grid[i][0])
-        for i in range(self.ORDER * 2):
-            v = random.choice(list(avail))
+        for i in range(self.SIZE - self.ORDER):
+            v = self.rng.choice(list(avail))
             avail.remove(v)
             grid[self.ORDER + i][0] = v
 
@@ -536,18 +1079,20 @@ class BeerGenerator(Generator):
         List[List[int]]
         """
         # board demarks the actual board, choices are all possibilities for a cell
-        board = [[0 for _ in range(9)] for _ in range(9)]
+        board = [[0 for _ in range(self.SIZE)] for _ in range(self.SIZE)]
         self.choose_box1(board)
         self.choose_box2(board)
         self.choose_box3(board)
         self.choose_col(board)
         choices = self.init_choices(board)
-        self.choose_rest(board, choices)
+        self.choose_rest(board, choices, rng=self.rng)
         return board
 
 
 class DiagonalGenerator(BeerGenerator):
-    def __init__(self, filename: str = None) -> None:
+    def __init__(
+        self, filename: str = None, order: int = None, rng: random.Random = None
+    ) -> None:
         """Class that uses slightly different methodology to Beer method
 
         Fills in diagonal, top-left to bottom-right, boxes then solves
@@ -556,8 +1101,12 @@ class DiagonalGenerator(BeerGenerator):
         ----------
         filename : str, optional
             location to store pickled boards or of existing file, by default None
+        order : int, optional
+            box width of the boards to make, by default ORDER
+        rng : random.Random, optional
+            source of every random choice, by default the random module
         """
-        super().__init__(filename)
+        super().__init__(filename, order, rng)
 
     def generate_board(self) -> List[List[int]]:
         """Generate new solved board
@@ -566,7 +1115,7 @@ class DiagonalGenerator(BeerGenerator):
         -------
         List[List[int]]
         """
-        board = [[0 for _ in range(9)] for _ in range(9)]
+        board = [[0 for _ in range(self.SIZE)] for _ in range(self.SIZE)]
 
         def choose_box(x, y, grid):
             # set to top left of the respective box
@@ -575,15 +1124,14 @@ class DiagonalGenerator(BeerGenerator):
             curr = self.FULL_SET.copy()
             for i in range(self.ORDER):
                 for j in range(self.ORDER):
-                    v = random.choice(list(curr))
+                    v = self.rng.choice(list(curr))
                     curr.remove(v)
                     grid[y + i][x + j] = v
 
-        choose_box(0, 0, board)
-        choose_box(3, 3, board)
-        choose_box(6, 6, board)
+        for i in range(0, self.SIZE, self.ORDER):
+            choose_box(i, i, board)
         choices = self.init_choices(board)
-        self.choose_rest(board, choices)
+        self.choose_rest(board, choices, rng=self.rng)
         return board
 
 
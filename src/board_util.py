@@ -0,0 +1,21 @@
+import math
+import pickle
+from typing import List, Union
+
+
+def board_order(board: List[List[Union[int, str]]]) -> int:
+    """Box width of a square board, 3 for 9x9, 4 for 16x16 and 5 for 25x25"""
+    return math.isqrt(len(board))
+
+
+def load_pickled_boards(filename: str) -> List[List[List[Union[int, str]]]]:
+    """Unpickle a list of boards, like Boards/board.pkl
+
+    A single board pickled on its own rather than in a list comes back as a list of one.
+    Raises FileNotFoundError if the file doesn't exist.
+    """
+    with open(filename, "rb") as fp:
+        boards = pickle.load(fp)
+    if boards and not isinstance(boards[0][0], list):
+        boards = [boards]
+    return boards
@@ -0,0 +1,169 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import time
+from typing import List, NamedTuple, Optional, Tuple
+
+from board_gen import BeerGenerator, DiagonalGenerator
+from store import SUFFIX, TemplateStore
+
+GENERATORS = {"beer": BeerGenerator, "diagonal": DiagonalGenerator}
+MANIFEST = "manifest.json"
+# templates in each shard, shards are the unit of work handed to a process
+SHARD_SIZE = 250
+
+# index, templates, path, seed, order, clues, difficulty, generator
+Job = Tuple[int, int, str, int, int, Optional[int], Optional[int], str]
+
+
+class Shard(NamedTuple):
+    """One store file written by a bulk run"""
+
+    index: int
+    file: str
+    count: int
+    sha256: str
+
+
+def shard_rng(seed: int, index: int) -> random.Random:
+    """The random stream of one shard
+
+    String seeds are hashed with sha512, so every shard of a seed gets an unrelated stream
+    and the same one on every machine and run.
+    """
+    return random.Random(f"{seed}:{index}")
+
+
+def _make_shard(job: Job) -> Shard:
+    index, count, path, seed, order, clues, difficulty, generator = job
+    gen = GENERATORS[generator](order=order, rng=shard_rng(seed, index))
+    for _ in range(count):
+        gen.carve_board_template(gen.generate_board(), clues, difficulty)
+    # start over rather than append to a shard left by an earlier run
+    if os.path.exists(path):
+        os.remove(path)
+    TemplateStore(path, gen.ORDER).extend(gen.boards)
+    with open(path, "rb") as fp:
+        digest = hashlib.sha256(fp.read()).hexdigest()
+    return Shard(index, os.path.basename(path), count, digest)
+
+
+def generate(
+    out_dir: str,
+    count: int,
+    seed: int = 0,
+    workers: int = None,
+    shard_size: int = SHARD_SIZE,
+    order: int = 3,
+    clues: int = None,
+    difficulty: int = None,
+    generator: str = "beer",
+) -> dict:
+    """Generate templates across a process pool into shards of template stores
+
+    Shard i holds templates i * shard_size onwards and is made from its own stream,
+    see shard_rng. A shard doesn't depend on which process made it or when, so the same
+    arguments give byte-identical shards and manifest for any number of workers.
+    Templates are carved with BeerGenerator.carve_board_template.
+
+    Parameters
+    ----------
+    out_dir : str
+        directory for the shards and manifest, created if missing
+    count : int
+        templates to make
+    seed : int, optional
+        master seed, by default 0
+    workers : int, optional
+        number of processes, by default one per cpu
+    shard_size : int, optional
+        templates in each shard, by default SHARD_SIZE
+    order : int, optional
+        box width of the boards, by default 3
+    clues : int, optional
+        carve until a template has this many clues, by default as few as possible
+    difficulty : int, optional
+        carve until a template reaches this get_board_diffic score, by default no target
+    generator : str, optional
+        one of GENERATORS, by default "beer"
+
+    Returns
+    -------
+    dict
+        the manifest, also written to MANIFEST in out_dir
+    """
+    if generator not in GENERATORS:
+        raise ValueError(
+            f"unknown generator {generator!r}, expected one of {tuple(GENERATORS)}"
+        )
+    os.makedirs(out_dir, exist_ok=True)
+    jobs: List[Job] = [
+        (
+            index,
+            min(shard_size, count - start),
+            os.path.join(out_dir, f"shard-{index:05d}{SUFFIX}"),
+            seed,
+            order,
+            clues,
+            difficulty,
+            generator,
+        )
+        for index, start in enumerate(range(0, count, shard_size))
+    ]
+    with multiprocessing.Pool(workers or os.cpu_count() or 1) as pool:
+        shards = sorted(pool.imap_unordered(_make_shard, jobs))
+    manifest = {
+        "seed": seed,
+        "count": count,
+        "shard_size": shard_size,
+        "order": order,
+        "clues": clues,
+        "difficulty": difficulty,
+        "generator": generator,
+        "shards": [shard._asdict() for shard in shards],
+    }
+    with open(os.path.join(out_dir, MANIFEST), "w") as fp:
+        json.dump(manifest, fp, indent=2)
+        fp.write("\n")
+    return manifest
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Generate templates across all cores into seeded template store shards"
+    )
+    parser.add_argument("output", help="directory to write the shards and manifest to")
+    parser.add_argument("-n", "--count", type=int, required=True)
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE)
+    parser.add_argument("--order", type=int, default=3)
+    parser.add_argument("--clues", type=int, default=None)
+    parser.add_argument("--difficulty", type=int, default=None)
+    parser.add_argument("-g", "--generator", choices=GENERATORS, default="beer")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    manifest = generate(
+        args.output,
+        args.count,
+        args.seed,
+        args.workers,
+        args.shard_size,
+        args.order,
+        args.clues,
+        args.difficulty,
+        args.generator,
+    )
+    seconds = time.perf_counter() - start
+    print(
+        f"{args.count} templates in {len(manifest['shards'])} shards "
+        f"in {seconds:.2f}s, {args.count / seconds:.0f}/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
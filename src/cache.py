@@ -0,0 +1,135 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+from dlx import DLXSolver
+from symmetry import Transform, canonicalize
+
+# the flattened solution in canonical coordinates, None when the puzzle has no solution
+Entry = Optional[Tuple[int, ...]]
+# canonical form of a board and the transform that reaches it
+Alias = Tuple[Tuple[int, ...], Transform]
+
+
+class SolutionCache:
+    """Bounded LRU cache of solutions in front of a solver, keyed by canonical form
+
+    Every relabeled, rotated or shuffled copy of a puzzle shares one entry. Solutions are
+    stored in canonical coordinates and mapped back through the inverse of the transform
+    that reached the canonical form, so all copies get the same answer.
+
+    Finding the canonical form costs more than a DLX solve of a 9x9 board, so the exact
+    boards seen are also remembered with their transform. A verbatim repeat is then a hit
+    without canonicalizing, and only new copies of a puzzle pay for it.
+
+    Safe to share between threads. Each thread solves with its own solver from
+    solver_factory, and two threads missing on the same puzzle at once both solve it.
+    """
+
+    def __init__(
+        self,
+        solver_factory: Callable[[], object] = DLXSolver,
+        maxsize: int = 10_000,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        solver_factory : Callable[[], object], optional
+            makes a solver with a solve_board(table) -> bool method, called once per
+            thread, by default DLXSolver
+        maxsize : int, optional
+            most solutions to keep, least recently used go first, by default 10_000
+        """
+        self.solver_factory = solver_factory
+        self.maxsize = maxsize
+        self._solutions: "OrderedDict[Tuple[int, ...], Entry]" = OrderedDict()
+        self._aliases: "OrderedDict[Tuple[int, ...], Alias]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _solver(self):
+        solver = getattr(self._local, "solver", None)
+        if solver is None:
+            solver = self._local.solver = self.solver_factory()
+        return solver
+
+    def solve_board(self, table: List[List[int]]) -> bool:
+        """Solve a board in place, from the cache when any copy of it was solved before
+
+        Parameters
+        ----------
+        table : List[List[int]]
+            the sudoku board, 0 for blanks
+
+        Returns
+        -------
+        bool
+            True on solved, False on failure
+        """
+        exact = tuple(v for row in table for v in row)
+        with self._lock:
+            alias = self._aliases.get(exact)
+            if alias is not None:
+                self._aliases.move_to_end(exact)
+        if alias is None:
+            alias = canonicalize(table)
+        key, transform = alias
+
+        with self._lock:
+            found = key in self._solutions
+            if found:
+                self.hits += 1
+                self._solutions.move_to_end(key)
+                solution = self._solutions[key]
+            else:
+                self.misses += 1
+            self._remember(self._aliases, exact, alias)
+
+        if not found:
+            size = len(table)
+            board = [list(key[i : i + size]) for i in range(0, size * size, size)]
+            solution = None
+            if self._solver().solve_board(board):
+                solution = tuple(v for row in board for v in row)
+            with self._lock:
+                if self._remember(self._solutions, key, solution):
+                    self.evictions += 1
+
+        if solution is None:
+            return False
+        size = len(table)
+        canon = [list(solution[i : i + size]) for i in range(0, size * size, size)]
+        for row, values in zip(table, transform.inverse().apply(canon)):
+            row[:] = values
+        return True
+
+    def _remember(self, memo: OrderedDict, key: Tuple[int, ...], value) -> bool:
+        # call holding self._lock, returns True when an old entry had to go
+        memo[key] = value
+        memo.move_to_end(key)
+        if len(memo) > self.maxsize:
+            memo.popitem(last=False)
+            return True
+        return False
+
+    def clear(self) -> None:
+        """Forget every solution, the counters are kept"""
+        with self._lock:
+            self._solutions.clear()
+            self._aliases.clear()
+
+    def stats(self) -> dict:
+        """Hit and miss counts, hit ratio, evictions and how full the cache is"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "size": len(self._solutions),
+                "maxsize": self.maxsize,
+            }
@@ -0,0 +1,201 @@
+from typing import List, Optional
+
+
+class DLXSolver:
+    """Dancing Links (Algorithm X) solver that treats sudoku as an exact cover problem
+
+    Every (row, column, value) placement is a row of the matrix and covers 4 constraints:
+    the cell is filled, and the value is used once in its row, column and box.
+    The linked matrix is built once per object, givens are covered before each search and
+    uncovered after it, so one solver can be reused for any number of boards.
+    """
+
+    def __init__(self, order: int = 3) -> None:
+        """
+        Parameters
+        ----------
+        order : int, optional
+            box width of the boards to solve, by default 3
+        """
+        self.order = order
+        self.size = order * order
+        n = self.size
+        cells = n * n
+        n_cols = 4 * cells
+        # node 0 is the root, nodes 1..n_cols are the column headers
+        self.L = [i - 1 for i in range(n_cols + 1)]
+        self.R = [i + 1 for i in range(n_cols + 1)]
+        self.L[0] = n_cols
+        self.R[n_cols] = 0
+        self.U = list(range(n_cols + 1))
+        self.D = list(range(n_cols + 1))
+        self.C = list(range(n_cols + 1))
+        self.S = [0] * (n_cols + 1)
+        self.ROW = [-1] * (n_cols + 1)
+        # first node of every placement row, indexed by (r * n + c) * n + v - 1
+        self.row_nodes: List[int] = []
+
+        for r in range(n):
+            for c in range(n):
+                b = (r // order) * order + c // order
+                for v in range(n):
+                    row_id = (r * n + c) * n + v
+                    columns = (
+                        1 + r * n + c,
+                        1 + cells + r * n + v,
+                        1 + 2 * cells + c * n + v,
+                        1 + 3 * cells + b * n + v,
+                    )
+                    first = len(self.L)
+                    for k, col in enumerate(columns):
+                        node = first + k
+                        # link horizontally in a circle of 4
+                        self.L.append(first + (k - 1) % 4)
+                        self.R.append(first + (k + 1) % 4)
+                        # link vertically at the bottom of the column
+                        self.U.append(self.U[col])
+                        self.D.append(col)
+                        self.D[self.U[col]] = node
+                        self.U[col] = node
+                        self.C.append(col)
+                        self.ROW.append(row_id)
+                        self.S[col] += 1
+                    self.row_nodes.append(first)
+        self._solution: Optional[List[int]] = None
+
+    def _cover(self, c: int) -> None:
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        L[R[c]] = L[c]
+        R[L[c]] = R[c]
+        i = D[c]
+        while i != c:
+            j = R[i]
+            while j != i:
+                U[D[j]] = U[j]
+                D[U[j]] = D[j]
+                S[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    def _uncover(self, c: int) -> None:
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        i = U[c]
+        while i != c:
+            j = L[i]
+            while j != i:
+                S[C[j]] += 1
+                U[D[j]] = j
+                D[U[j]] = j
+                j = L[j]
+            i = U[i]
+        L[R[c]] = c
+        R[L[c]] = c
+
+    def _search(self, chosen: List[int], limit: int) -> int:
+        """Algorithm X, stops once limit solutions are found
+
+        The first solution found is kept in self._solution as a list of row nodes.
+        The matrix is always restored before returning.
+        """
+        R, D, S = self.R, self.D, self.S
+        c = R[0]
+        if c == 0:
+            if self._solution is None:
+                self._solution = list(chosen)
+            return 1
+        # pick the column with the fewest rows left
+        best, score = c, S[c]
+        while c != 0 and score > 1:
+            if S[c] < score:
+                best, score = c, S[c]
+            c = R[c]
+        if score == 0:
+            return 0
+
+        self._cover(best)
+        found = 0
+        r = D[best]
+        while r != best:
+            chosen.append(r)
+            j = R[r]
+            while j != r:
+                self._cover(self.C[j])
+                j = R[j]
+            found += self._search(chosen, limit - found)
+            j = self.L[r]
+            while j != r:
+                self._uncover(self.C[j])
+                j = self.L[j]
+            chosen.pop()
+            if found >= limit:
+                break
+            r = D[r]
+        self._uncover(best)
+        return found
+
+    def _run(self, table: List[List[int]], limit: int) -> int:
+        """Cover the givens of table, search for up to limit solutions then restore the matrix"""
+        n = self.size
+        R, L = self.R, self.L
+        given: List[int] = []
+        found = 0
+        self._solution = None
+        try:
+            for r in range(n):
+                for c in range(n):
+                    v = table[r][c]
+                    if v == 0:
+                        continue
+                    if not 1 <= v <= n:
+                        return 0
+                    node = self.row_nodes[(r * n + c) * n + v - 1]
+                    # a covered column means the value clashes with an earlier given
+                    j = node
+                    while True:
+                        col = self.C[j]
+                        if R[L[col]] != col:
+                            return 0
+                        j = R[j]
+                        if j == node:
+                            break
+                    given.append(node)
+                    j = node
+                    while True:
+                        self._cover(self.C[j])
+                        j = R[j]
+                        if j == node:
+                            break
+            found = self._search([], limit)
+        finally:
+            # undo the givens in reverse so the links come back exactly
+            for node in reversed(given):
+                j = L[node]
+                while True:
+                    self._uncover(self.C[j])
+                    if j == node:
+                        break
+                    j = L[j]
+        return found
+
+    def solve_board(self, table: List[List[int]]) -> bool:
+        """Solve an input sudoku board in place
+
+        Parameters
+        ----------
+        table : List[List[int]]
+            the sudoku board, 0 for blanks
+
+        Returns
+        -------
+        bool
+            True on solved, False on failure
+        """
+        if self._run(table, 1) == 0:
+            return False
+        n = self.size
+        for node in self._solution:
+            row_id = self.ROW[node]
+            cell, v = divmod(row_id, n)
+            r, c = divmod(cell, n)
+            table[r][c] = v + 1
+        return True
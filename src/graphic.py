@@ -13,9 +13,45 @@
 # main()
 # pygame.quit()
 import pygame
+import threading
 import time
+from board import Board
+from board_gen import FreedomMask, NaiveSolver, board_order
+from dlx import DLXSolver
+from instrument import SolveCancelled, TraceRecorder
 pygame.font.init()
 
+FPS = 30  # most frames drawn a second, the loop sleeps the rest of the time
+TRACE_LIMIT = 4096  # events the solver records ahead of the replay before it waits
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+GREY = (128, 128, 128)
+RED = (255, 0, 0)
+GREEN = (0, 255, 0)
+
+_fonts = {}
+
+
+def get_font(size):
+    """Load the arial font of a size once and reuse it"""
+    if size not in _fonts:
+        _fonts[size] = pygame.font.SysFont("arial", size)
+    return _fonts[size]
+
+
+class Glyphs:
+    """Text rendered once per colour and kept, so drawing a digit is only a blit"""
+
+    def __init__(self, size):
+        self.font = get_font(size)
+        self.cache = {}
+
+    def get(self, text, color):
+        key = (text, color)
+        if key not in self.cache:
+            self.cache[key] = self.font.render(str(text), 1, color)
+        return self.cache[key]
+
 
 class Grid:
     board = [
@@ -36,55 +72,119 @@ class Grid:
         self.cubes = [[Cube(self.board[i][j], i, j, width, height) for j in range(cols)] for i in range(rows)]
         self.width = width
         self.height = height
+        self.order = board_order(self.cubes)
+        self.gap = width / cols
+        self.glyphs = Glyphs(int(self.gap * 2 / 3))
+        for row in self.cubes:
+            for cube in row:
+                cube.rows, cube.cols = rows, cols
+        self.sketched = set()  # (row, col) of cells holding a sketch
         self.model = None
+        self.used = None  # values in each row, column and box of the model
+        self.blanks = 0
         self.update_model()
+        # solved once up front, every placement is checked against it
+        self.solution = self.model.copy()
+        if not DLXSolver(self.order).solve_board(self.solution):
+            self.solution = None
         self.selected = None
         self.win = win
 
     def update_model(self):
-        self.model = [[self.cubes[i][j].value for j in range(self.cols)] for i in range(self.rows)]
+        """Copy the cubes into the model and rebuild occupancy, placements keep them up to date"""
+        if self.model is None:
+            self.model = Board(order=self.order)
+        self.model.cells[:] = bytes(cube.value for row in self.cubes for cube in row)
+        self.used = FreedomMask(self.model, self.order)
+        self.blanks = self.model.count(0)
 
     def place(self, val):
         row, col = self.selected
         if self.cubes[row][col].value == 0:
-            self.cubes[row][col].set(val)
-            self.update_model()
-
-            if valid(self.model, val, (row,col)) and self.solve():
+            if self.solution is not None and self.solution[row][col] == val:
+                self.cubes[row][col].set(val)
+                self.model[row][col] = val
+                self.used.place(row, col, val)
+                self.blanks -= 1
                 return True
             else:
-                self.cubes[row][col].set(0)
                 self.cubes[row][col].set_temp(0)
-                self.update_model()
                 return False
 
+    def conflicts(self, row, col, val):
+        """True when val is already in the row, column or box of cell [row][col]"""
+        return not self.used.free(row, col) & (1 << val)
+
     def sketch(self, val):
         row, col = self.selected
         self.cubes[row][col].set_temp(val)
+        self.sketched.add((row, col))
 
-    def draw(self):
-        # Draw Grid Lines
-        gap = self.width / 9
+    def draw_lines(self):
+        gap = self.gap
         for i in range(self.rows+1):
-            if i % 3 == 0 and i != 0:
+            if i % self.order == 0 and i != 0:
                 thick = 4
             else:
                 thick = 1
-            pygame.draw.line(self.win, (0,0,0), (0, i*gap), (self.width, i*gap), thick)
-            pygame.draw.line(self.win, (0, 0, 0), (i * gap, 0), (i * gap, self.height), thick)
+            pygame.draw.line(self.win, BLACK, (0, i*gap), (self.width, i*gap), thick)
+            pygame.draw.line(self.win, BLACK, (i * gap, 0), (i * gap, self.height), thick)
 
-        # Draw Cubes
+    def draw(self):
+        """Draw the whole grid"""
+        pygame.draw.rect(self.win, WHITE, (0, 0, self.width, self.height), 0)
+        self.draw_lines()
+        self.check_conflicts()
         for i in range(self.rows):
             for j in range(self.cols):
-                self.cubes[i][j].draw(self.win)
+                self.cubes[i][j].draw(self.win, self.glyphs)
+                self.cubes[i][j].dirty = False
+
+    def draw_dirty(self):
+        """Redraw only the cells that changed since they were last drawn
+
+        Each cell is cleared and drawn with the window clipped to it, grid lines included,
+        so neighbouring cells are left alone.
+
+        :return: rects of the window that changed, for pygame.display.update
+        """
+        self.check_conflicts()
+        rects = []
+        for row in self.cubes:
+            for cube in row:
+                if cube.dirty:
+                    rect = cube.rect()
+                    self.win.set_clip(rect)
+                    pygame.draw.rect(self.win, WHITE, rect, 0)
+                    self.draw_lines()
+                    cube.draw(self.win, self.glyphs)
+                    self.win.set_clip(None)
+                    cube.dirty = False
+                    rects.append(rect)
+        return rects
+
+    def check_conflicts(self):
+        # sketches that clash with a placed value are shown in red
+        for i, j in list(self.sketched):
+            cube = self.cubes[i][j]
+            if cube.value != 0 or cube.temp == 0:
+                self.sketched.discard((i, j))
+                conflict = False
+            else:
+                conflict = self.conflicts(i, j, cube.temp)
+            if cube.conflict != conflict:
+                cube.conflict = conflict
+                cube.dirty = True
 
     def select(self, row, col):
-        # Reset all other
-        for i in range(self.rows):
-            for j in range(self.cols):
-                self.cubes[i][j].selected = False
+        # Reset the last one
+        if self.selected:
+            i, j = self.selected
+            self.cubes[i][j].selected = False
+            self.cubes[i][j].dirty = True
 
         self.cubes[row][col].selected = True
+        self.cubes[row][col].dirty = True
         self.selected = (row, col)
 
     def clear(self):
@@ -98,7 +198,7 @@ class Grid:
         :return: (row, col)
         """
         if pos[0] < self.width and pos[1] < self.height:
-            gap = self.width / 9
+            gap = self.gap
             x = pos[0] // gap
             y = pos[1] // gap
             return (int(y),int(x))
@@ -106,57 +206,95 @@ class Grid:
             return None
 
     def is_finished(self):
-        for i in range(self.rows):
-            for j in range(self.cols):
-                if self.cubes[i][j].value == 0:
-                    return False
-        return True
-
-    def solve(self):
-        find = find_empty(self.model)
-        if not find:
-            return True
-        else:
-            row, col = find
-
-        for i in range(1, 10):
-            if valid(self.model, i, (row, col)):
-                self.model[row][col] = i
-
-                if self.solve():
-                    return True
-
-                self.model[row][col] = 0
-
-        return False
+        return self.blanks == 0
 
     def solve_gui(self):
-        find = find_empty(self.model)
-        if not find:
-            return True
-        else:
-            row, col = find
-
-        for i in range(1, 10):
-            if valid(self.model, i, (row, col)):
-                self.model[row][col] = i
-                self.cubes[row][col].set(i)
-                self.cubes[row][col].draw_change(self.win, True)
-                self.update_model()
-                pygame.display.update()
-                # pygame.time.delay(100)
+        """Solve on a worker thread, the returned SolveAnimation replays it onto the cubes"""
+        self.update_model()
+        return SolveAnimation(self)
 
-                if self.solve_gui():
-                    return True
 
-                self.model[row][col] = 0
-                self.cubes[row][col].set(0)
-                self.update_model()
-                self.cubes[row][col].draw_change(self.win, False)
-                pygame.display.update()
-                # pygame.time.delay(100)
+class SolveAnimation:
+    """Replays a solve onto the grid while a worker thread runs it
+
+    The solver records every place and backtrack to a TraceRecorder and only waits on the
+    window once it is TRACE_LIMIT events ahead of the replay. Each frame tick applies as many
+    events as the speed allows, so the window keeps handling input and the solve can be
+    paused, stepped or cancelled.
+    """
 
-        return False
+    def __init__(self, grid, speed=200):
+        """
+        :param grid: Grid to solve, its model is copied for the solver
+        :param speed: events replayed a second
+        """
+        self.grid = grid
+        self.speed = speed
+        self.paused = False
+        self.solved = None  # set by the worker once the solve ends
+        self.trace = TraceRecorder(TRACE_LIMIT)
+        self.start = grid.model.copy()
+        self.budget = 0.0  # events owed to the replay since the last tick
+        self.last = None  # cube highlighted by the last event
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    def run(self):
+        # the backtracker indexes the board in its inner loop, lists are far quicker for that
+        # than a Board. The replay puts the values on the cubes, nothing needs copying back
+        table = self.start.tolist()
+        try:
+            self.solved = NaiveSolver.solve_board(table, self.trace)
+        except SolveCancelled:
+            self.solved = False
+
+    def step(self, count=1):
+        """Replay up to count more events, as many as the worker has recorded"""
+        for event in self.trace.take(count):
+            kind, row, col, val = self.trace.decode(event)
+            if self.last is not None:
+                self.last.set_flash(None)
+            cube = self.grid.cubes[row][col]
+            if kind == TraceRecorder.PLACE:
+                cube.set(val)
+                cube.set_flash(GREEN)
+            else:
+                cube.set(0)
+                cube.set_flash(RED)
+            self.last = cube
+
+    def tick(self, seconds):
+        """Advance the replay by the events due in seconds at the current speed"""
+        if self.paused:
+            return
+        self.budget += self.speed * seconds
+        count = int(self.budget)
+        self.budget -= count
+        self.step(count)
+
+    def faster(self):
+        self.speed *= 2
+
+    def slower(self):
+        self.speed = max(1, self.speed // 2)
+
+    def done(self):
+        return not self.worker.is_alive() and not self.trace.events
+
+    def finish(self):
+        """Hand the grid back once the replay is done"""
+        if self.last is not None:
+            self.last.set_flash(None)
+        self.grid.update_model()
+
+    def cancel(self):
+        """Stop the solve and put the grid back as it was"""
+        self.trace.cancel()
+        self.worker.join()
+        for i, row in enumerate(self.start):
+            for j, val in enumerate(row):
+                self.grid.cubes[i][j].set(val)
+        self.finish()
 
 
 class Cube:
@@ -171,90 +309,70 @@ class Cube:
         self.width = width
         self.height = height
         self.selected = False
+        self.conflict = False
+        self.flash = None  # colour of the border marking the last solver step
+        self.dirty = True  # changed since it was last drawn
 
-    def draw(self, win):
-        fnt = pygame.font.SysFont("arial", 40)
+    def rect(self):
+        gap = self.width / self.cols
+        return pygame.Rect(round(self.col * gap), round(self.row * gap), round(gap), round(gap))
 
-        gap = self.width / 9
+    def draw(self, win, glyphs):
+        gap = self.width / self.cols
         x = self.col * gap
         y = self.row * gap
 
         if self.temp != 0 and self.value == 0:
-            text = fnt.render(str(self.temp), 1, (128,128,128))
+            color = RED if self.conflict else GREY
+            text = glyphs.get(self.temp, color)
             win.blit(text, (x+5, y+5))
         elif not(self.value == 0):
-            text = fnt.render(str(self.value), 1, (0, 0, 0))
+            text = glyphs.get(self.value, BLACK)
             win.blit(text, (x + (gap/2 - text.get_width()/2), y + (gap/2 - text.get_height()/2)))
 
-        if self.selected:
-            pygame.draw.rect(win, (255,0,0), (x,y, gap ,gap), 3)
-
-    def draw_change(self, win, g=True):
-        fnt = pygame.font.SysFont("arial", 40)
-
-        gap = self.width / 9
-        x = self.col * gap
-        y = self.row * gap
-
-        pygame.draw.rect(win, (255, 255, 255), (x, y, gap, gap), 0)
-
-        text = fnt.render(str(self.value), 1, (0, 0, 0))
-        win.blit(text, (x + (gap / 2 - text.get_width() / 2), y + (gap / 2 - text.get_height() / 2)))
-        if g:
-            pygame.draw.rect(win, (0, 255, 0), (x, y, gap, gap), 3)
-        else:
-            pygame.draw.rect(win, (255, 0, 0), (x, y, gap, gap), 3)
+        if self.flash:
+            pygame.draw.rect(win, self.flash, (x, y, gap, gap), 3)
+        elif self.selected:
+            pygame.draw.rect(win, RED, (x,y, gap ,gap), 3)
 
     def set(self, val):
-        self.value = val
+        if val != self.value:
+            self.value = val
+            self.dirty = True
 
     def set_temp(self, val):
-        self.temp = val
-
-
-def find_empty(bo):
-    for i in range(len(bo)):
-        for j in range(len(bo[0])):
-            if bo[i][j] == 0:
-                return (i, j)  # row, col
+        if val != self.temp:
+            self.temp = val
+            self.dirty = True
 
-    return None
+    def set_flash(self, color):
+        if color != self.flash:
+            self.flash = color
+            self.dirty = True
 
 
-def valid(bo, num, pos):
-    # Check row
-    for i in range(len(bo[0])):
-        if bo[pos[0]][i] == num and pos[1] != i:
-            return False
-
-    # Check column
-    for i in range(len(bo)):
-        if bo[i][pos[1]] == num and pos[0] != i:
-            return False
-
-    # Check box
-    box_x = pos[1] // 3
-    box_y = pos[0] // 3
-
-    for i in range(box_y*3, box_y*3 + 3):
-        for j in range(box_x * 3, box_x*3 + 3):
-            if bo[i][j] == num and (i,j) != pos:
-                return False
+def redraw_window(win, board, time, strikes):
+    win.fill((255,255,255))
+    draw_status(win, board, time, strikes)
+    # Draw grid and board
+    board.draw()
 
-    return True
 
+def draw_status(win, board, time, strikes):
+    """Draw the time and strikes under the grid
 
-def redraw_window(win, board, time, strikes):
-    win.fill((255,255,255))
+    :return: rect of the window that changed
+    """
+    rect = pygame.Rect(0, board.height, win.get_width(), win.get_height() - board.height)
+    pygame.draw.rect(win, WHITE, rect, 0)
+    fnt = get_font(40)
     # Draw time
-    fnt = pygame.font.SysFont("arial", 40)
     text = fnt.render("Time: " + format_time(time), 1, (0,0,0))
     win.blit(text, (540 - 160, 560))
     # Draw Strikes
     text = fnt.render("X " * strikes, 1, (255, 0, 0))
     win.blit(text, (20, 560))
-    # Draw grid and board
-    board.draw()
+    return rect
 
 
 def format_time(secs):
@@ -274,6 +392,12 @@ def main():
     run = True
     start = time.time()
     strikes = 0
+    clock = pygame.time.Clock()
+    redraw_window(win, board, 0, strikes)
+    pygame.display.update()
+    status = (0, strikes)
+    anim = None  # solve being replayed, see SolveAnimation
+    elapsed = 0
     while run:
 
         play_time = round(time.time() - start)
@@ -281,6 +405,9 @@ def main():
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 run = False
+            if event.type == pygame.VIDEOEXPOSE:
+                redraw_window(win, board, play_time, strikes)
+                pygame.display.update()
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_1:
                     key = 1
@@ -304,10 +431,25 @@ def main():
                     board.clear()
                     key = None
 
-                if event.key == pygame.K_SPACE:
-                    board.solve_gui()
-
-                if event.key == pygame.K_RETURN:
+                if event.key == pygame.K_SPACE and anim is None:
+                    anim = board.solve_gui()
+
+                # p pauses the solve, right steps it, up and down change speed, escape stops it
+                if anim is not None:
+                    if event.key == pygame.K_p:
+                        anim.paused = not anim.paused
+                    if event.key == pygame.K_RIGHT:
+                        anim.paused = True
+                        anim.step()
+                    if event.key == pygame.K_UP:
+                        anim.faster()
+                    if event.key == pygame.K_DOWN:
+                        anim.slower()
+                    if event.key == pygame.K_ESCAPE:
+                        anim.cancel()
+                        anim = None
+
+                if event.key == pygame.K_RETURN and anim is None:
                     i, j = board.selected
                     if board.cubes[i][j].temp != 0:
                         if board.place(board.cubes[i][j].temp):
@@ -330,8 +472,22 @@ def main():
         if board.selected and key != None:
             board.sketch(key)
 
-        redraw_window(win, board, play_time, strikes)
-        pygame.display.update()
+        if anim is not None:
+            anim.tick(elapsed / 1000)
+            if anim.done():
+                anim.finish()
+                if not anim.solved:
+                    print("No solution")
+                anim = None
+
+        # only what changed is drawn and pushed to the screen
+        dirty = board.draw_dirty()
+        if (play_time, strikes) != status:
+            dirty.append(draw_status(win, board, play_time, strikes))
+            status = (play_time, strikes)
+        if dirty:
+            pygame.display.update(dirty)
+        elapsed = clock.tick(FPS)
 
 
 main()
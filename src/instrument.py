@@ -0,0 +1,164 @@
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+# per-cell callback, called with the event name ("place" or "backtrack"), row, col and value
+CellCallback = Callable[[str, int, int, int], None]
+
+
+class SolverObserver:
+    """Receives events from a solver as it searches, every method does nothing by default
+
+    Solvers take an optional observer and only run their instrumented path when one is given,
+    so leaving it out costs nothing. Subclass and override the events of interest.
+    """
+
+    def enter(self, depth: int) -> None:
+        """A search node is visited, depth is the number of guesses made so far"""
+
+    def place(self, row: int, col: int, val: int, depth: int) -> None:
+        """val is tried in cell [row][col]"""
+
+    def backtrack(self, row: int, col: int, val: int, depth: int) -> None:
+        """val is taken back out of cell [row][col]"""
+
+    def eliminate(self, count: int) -> None:
+        """count candidates were ruled out by the constraints"""
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Wrap a named phase of the solve, such as setup or search"""
+        yield
+
+
+class SolverStats(SolverObserver):
+    """Observer that counts nodes, backtracks, max depth and eliminations, and times each phase"""
+
+    def __init__(self, on_cell: Optional[CellCallback] = None) -> None:
+        """
+        Parameters
+        ----------
+        on_cell : CellCallback, optional
+            called on every place and backtrack with the event name, row, col and value,
+            by default None
+        """
+        self.on_cell = on_cell
+        self.nodes = 0
+        self.backtracks = 0
+        self.max_depth = 0
+        self.eliminations = 0
+        self.phases: Dict[str, float] = {}
+
+    def enter(self, depth: int) -> None:
+        self.nodes += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def place(self, row: int, col: int, val: int, depth: int) -> None:
+        if self.on_cell is not None:
+            self.on_cell("place", row, col, val)
+
+    def backtrack(self, row: int, col: int, val: int, depth: int) -> None:
+        self.backtracks += 1
+        if self.on_cell is not None:
+            self.on_cell("backtrack", row, col, val)
+
+    def eliminate(self, count: int) -> None:
+        self.eliminations += count
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def as_dict(self) -> dict:
+        """Counters and phase times in seconds, ready for json"""
+        return {
+            "nodes": self.nodes,
+            "backtracks": self.backtracks,
+            "max_depth": self.max_depth,
+            "eliminations": self.eliminations,
+            "phases": dict(self.phases),
+        }
+
+
+class SolveCancelled(Exception):
+    """Raised from inside a solve whose TraceRecorder was cancelled"""
+
+
+class TraceRecorder(SolverObserver):
+    """Observer that records every place and backtrack to a compact log, to replay later
+
+    Each event is packed into one unsigned int of an array, see encode. The solver can run
+    on a worker thread while another thread reads the log. With a limit the log is a bounded
+    buffer instead, the reader takes events off the front and the solver waits while limit
+    of them are unread, so a solve far ahead of its replay doesn't grow the log without end.
+    After cancel the next event raises SolveCancelled, which unwinds the solve.
+    """
+
+    PLACE = 0
+    BACKTRACK = 1
+
+    def __init__(self, limit: Optional[int] = None) -> None:
+        """
+        Parameters
+        ----------
+        limit : int, optional
+            most unread events held before the solver waits for take, by default no limit
+            and every event is kept
+        """
+        self.events = array("L")
+        self.limit = limit
+        self._cancelled = threading.Event()
+        self._room = threading.Condition()
+
+    @staticmethod
+    def encode(kind: int, row: int, col: int, val: int) -> int:
+        """Pack an event, row, col and val each take 6 bits so boards up to 63x63 fit"""
+        return (((row << 6 | col) << 6 | val) << 1) | kind
+
+    @staticmethod
+    def decode(event: int) -> Tuple[int, int, int, int]:
+        """Unpack an event into kind, row, col and val"""
+        return event & 1, event >> 13 & 63, event >> 7 & 63, event >> 1 & 63
+
+    def _record(self, event: int) -> None:
+        if self.limit is None:
+            if self._cancelled.is_set():
+                raise SolveCancelled()
+            self.events.append(event)
+            return
+        with self._room:
+            self._room.wait_for(
+                lambda: self._cancelled.is_set() or len(self.events) < self.limit
+            )
+            if self._cancelled.is_set():
+                raise SolveCancelled()
+            self.events.append(event)
+
+    def place(self, row: int, col: int, val: int, depth: int) -> None:
+        self._record(self.encode(self.PLACE, row, col, val))
+
+    def backtrack(self, row: int, col: int, val: int, depth: int) -> None:
+        self._record(self.encode(self.BACKTRACK, row, col, val))
+
+    def take(self, count: int) -> array:
+        """Remove and return up to count of the oldest events, making room for the solver"""
+        with self._room:
+            # events are only appended, so the first count stay put while they are copied
+            count = min(count, len(self.events))
+            events = self.events[:count]
+            del self.events[:count]
+            self._room.notify_all()
+        return events
+
+    def cancel(self) -> None:
+        """Stop the solve at its next event, or right away if it is waiting for room"""
+        self._cancelled.set()
+        with self._room:
+            self._room.notify_all()
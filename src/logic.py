@@ -0,0 +1,417 @@
+from functools import lru_cache
+from itertools import combinations
+from typing import Callable, Dict, List, NamedTuple, Tuple
+
+from instrument import SolverObserver
+
+# in order of difficulty, easier techniques are always tried first
+TECHNIQUES = (
+    "hidden_single",
+    "naked_single",
+    "pointing",
+    "claiming",
+    "naked_pair",
+    "x_wing",
+    "hidden_pair",
+    "naked_triple",
+    "swordfish",
+    "hidden_triple",
+)
+
+
+class Layout(NamedTuple):
+    """Index tables for a board stored as a flat list of cells, row by row"""
+
+    order: int
+    size: int
+    rows: Tuple[Tuple[int, ...], ...]
+    cols: Tuple[Tuple[int, ...], ...]
+    boxes: Tuple[Tuple[int, ...], ...]
+    units: Tuple[Tuple[int, ...], ...]  # rows, then cols, then boxes
+    peers: Tuple[Tuple[int, ...], ...]  # cells sharing a unit with each cell
+    cell_box: Tuple[int, ...]
+
+
+@lru_cache(maxsize=None)
+def layout(order: int = 3) -> Layout:
+    """Build the index tables for boards with boxes order wide"""
+    size = order * order
+    rows = tuple(tuple(r * size + c for c in range(size)) for r in range(size))
+    cols = tuple(tuple(r * size + c for r in range(size)) for c in range(size))
+    boxes = tuple(
+        tuple(
+            (b // order * order + i) * size + b % order * order + j
+            for i in range(order)
+            for j in range(order)
+        )
+        for b in range(size)
+    )
+    cell_box = [0] * (size * size)
+    for b, box in enumerate(boxes):
+        for cell in box:
+            cell_box[cell] = b
+    peers = tuple(
+        tuple(
+            sorted(
+                (
+                    set(rows[cell // size])
+                    | set(cols[cell % size])
+                    | set(boxes[cell_box[cell]])
+                )
+                - {cell}
+            )
+        )
+        for cell in range(size * size)
+    )
+    return Layout(
+        order, size, rows, cols, boxes, rows + cols + boxes, peers, tuple(cell_box)
+    )
+
+
+def popcount(mask: int) -> int:
+    return bin(mask).count("1")
+
+
+class Contradiction(Exception):
+    """Raised inside the solver when a cell or unit runs out of candidates"""
+
+
+class LogicSolver:
+    """Solve the way a person would, only guessing when no technique makes progress
+
+    Candidates are kept as one bitmask per cell, bit v set when v can still go there.
+    Techniques are applied easiest first until none of them change anything, see TECHNIQUES.
+    If that doesn't finish the board a search takes over, guessing in the cell with the fewest
+    candidates and running naked and hidden singles after every guess.
+
+    After each solve, techniques counts how many times each technique made progress before
+    the first guess, and guesses counts the guesses the search made.
+    """
+
+    def __init__(self, order: int = 3) -> None:
+        """
+        Parameters
+        ----------
+        order : int, optional
+            box width of the boards to solve, by default 3
+        """
+        self.layout = layout(order)
+        self.full = ((1 << self.layout.size) - 1) << 1  # bits 1..size
+        self.techniques: Dict[str, int] = {}
+        self.guesses = 0
+        self._steps: List[Tuple[str, Callable[[List[int], List[int]], int]]] = [
+            ("hidden_single", self._hidden_single),
+            ("naked_single", self._naked_single),
+            ("pointing", self._pointing),
+            ("claiming", self._claiming),
+            ("naked_pair", lambda g, c: self._naked_subset(g, c, 2)),
+            ("x_wing", lambda g, c: self._fish(g, c, 2)),
+            ("hidden_pair", lambda g, c: self._hidden_subset(g, c, 2)),
+            ("naked_triple", lambda g, c: self._naked_subset(g, c, 3)),
+            ("swordfish", lambda g, c: self._fish(g, c, 3)),
+            ("hidden_triple", lambda g, c: self._hidden_subset(g, c, 3)),
+        ]
+
+    @property
+    def hardest(self) -> str:
+        """Hardest technique the last solve needed, empty if nothing was needed"""
+        used = [name for name in TECHNIQUES if self.techniques.get(name)]
+        return used[-1] if used else ""
+
+    # -- candidate bookkeeping --
+
+    def _place(self, grid: List[int], cands: List[int], cell: int, v: int) -> None:
+        bit = 1 << v
+        if not cands[cell] & bit:
+            raise Contradiction
+        grid[cell] = v
+        cands[cell] = bit
+        for p in self.layout.peers[cell]:
+            if cands[p] & bit:
+                cands[p] &= ~bit
+                if not cands[p]:
+                    raise Contradiction
+
+    def _eliminate(self, cands: List[int], cell: int, mask: int) -> bool:
+        if not cands[cell] & mask:
+            return False
+        cands[cell] &= ~mask
+        if not cands[cell]:
+            raise Contradiction
+        return True
+
+    # -- techniques, each sweeps the board once and returns how many times it made progress --
+
+    def _naked_single(self, grid: List[int], cands: List[int]) -> int:
+        found = 0
+        for cell, m in enumerate(cands):
+            if grid[cell] == 0 and not m & (m - 1):
+                self._place(grid, cands, cell, m.bit_length() - 1)
+                found += 1
+        return found
+
+    def _hidden_single(self, grid: List[int], cands: List[int]) -> int:
+        found = 0
+        for unit in self.layout.units:
+            once = more = placed = 0
+            for cell in unit:
+                m = cands[cell]
+                if grid[cell]:
+                    placed |= m
+                else:
+                    more |= once & m
+                    once |= m
+            if (once | placed) != self.full:
+                raise Contradiction  # a value has nowhere to go
+            singles = once & ~more & ~placed
+            while singles:
+                bit = singles & -singles
+                singles ^= bit
+                for cell in unit:
+                    if grid[cell] == 0 and cands[cell] & bit:
+                        self._place(grid, cands, cell, bit.bit_length() - 1)
+                        found += 1
+                        break
+        return found
+
+    def _naked_subset(self, grid: List[int], cands: List[int], k: int) -> int:
+        found = 0
+        for unit in self.layout.units:
+            open_cells = [c for c in unit if grid[c] == 0]
+            small = [c for c in open_cells if popcount(cands[c]) <= k]
+            for combo in combinations(small, k):
+                union = 0
+                for c in combo:
+                    union |= cands[c]
+                if popcount(union) != k:
+                    continue
+                changed = False
+                for c in open_cells:
+                    if c not in combo and self._eliminate(cands, c, union):
+                        changed = True
+                found += changed
+        return found
+
+    def _hidden_subset(self, grid: List[int], cands: List[int], k: int) -> int:
+        found = 0
+        size = self.layout.size
+        for unit in self.layout.units:
+            # positions in the unit each unplaced value can go, as a bitmask
+            where: Dict[int, int] = {}
+            for v in range(1, size + 1):
+                bit = 1 << v
+                pos = 0
+                for i, cell in enumerate(unit):
+                    if cands[cell] & bit:
+                        if grid[cell]:
+                            break
+                        pos |= 1 << i
+                else:
+                    if 2 <= popcount(pos) <= k:
+                        where[v] = pos
+            for combo in combinations(where, k):
+                pos = 0
+                for v in combo:
+                    pos |= where[v]
+                if popcount(pos) != k:
+                    continue
+                keep = 0
+                for v in combo:
+                    keep |= 1 << v
+                changed = False
+                for i, cell in enumerate(unit):
+                    if pos >> i & 1 and self._eliminate(cands, cell, ~keep & self.full):
+                        changed = True
+                found += changed
+        return found
+
+    def _pointing(self, grid: List[int], cands: List[int]) -> int:
+        # a value confined to one row or column of a box is removed from the rest of that line
+        found = 0
+        size = self.layout.size
+        for box in self.layout.boxes:
+            for v in range(1, size + 1):
+                bit = 1 << v
+                spots = [c for c in box if grid[c] == 0 and cands[c] & bit]
+                if len(spots) < 2:
+                    continue
+                for line, key in ((self.layout.rows, size), (self.layout.cols, 1)):
+                    if key == size:
+                        same = {c // size for c in spots}
+                    else:
+                        same = {c % size for c in spots}
+                    if len(same) != 1:
+                        continue
+                    changed = False
+                    for c in line[same.pop()]:
+                        if c not in box and grid[c] == 0:
+                            changed |= self._eliminate(cands, c, bit)
+                    found += changed
+        return found
+
+    def _claiming(self, grid: List[int], cands: List[int]) -> int:
+        # a value confined to one box within a line is removed from the rest of that box
+        found = 0
+        size = self.layout.size
+        cell_box = self.layout.cell_box
+        for line in self.layout.rows + self.layout.cols:
+            for v in range(1, size + 1):
+                bit = 1 << v
+                spots = [c for c in line if grid[c] == 0 and cands[c] & bit]
+                if len(spots) < 2:
+                    continue
+                boxes = {cell_box[c] for c in spots}
+                if len(boxes) != 1:
+                    continue
+                changed = False
+                for c in self.layout.boxes[boxes.pop()]:
+                    if c not in line and grid[c] == 0:
+                        changed |= self._eliminate(cands, c, bit)
+                found += changed
+        return found
+
+    def _fish(self, grid: List[int], cands: List[int], k: int) -> int:
+        # k lines whose spots for a value fall in k cross lines clear it from the rest of them
+        found = 0
+        size = self.layout.size
+        for base, cover in (
+            (self.layout.rows, self.layout.cols),
+            (self.layout.cols, self.layout.rows),
+        ):
+            for v in range(1, size + 1):
+                bit = 1 << v
+                where: Dict[int, int] = {}
+                for i, line in enumerate(base):
+                    pos = 0
+                    for j, cell in enumerate(line):
+                        if grid[cell] == 0 and cands[cell] & bit:
+                            pos |= 1 << j
+                    if 2 <= popcount(pos) <= k:
+                        where[i] = pos
+                for combo in combinations(where, k):
+                    pos = 0
+                    for i in combo:
+                        pos |= where[i]
+                    if popcount(pos) != k:
+                        continue
+                    changed = False
+                    for j in range(size):
+                        if not pos >> j & 1:
+                            continue
+                        for i, cell in enumerate(cover[j]):
+                            if i not in combo and grid[cell] == 0:
+                                changed |= self._eliminate(cands, cell, bit)
+                    found += changed
+        return found
+
+    # -- driving the techniques --
+
+    def _deduce(
+        self,
+        grid: List[int],
+        cands: List[int],
+        steps: int,
+        counts: Dict[str, int] = None,
+        observer: SolverObserver = None,
+    ) -> None:
+        """Apply the first steps techniques until none make progress, raises Contradiction"""
+        while 0 in grid:
+            before = sum(map(popcount, cands)) if observer is not None else 0
+            for name, step in self._steps[:steps]:
+                made = step(grid, cands)
+                if made:
+                    if counts is not None:
+                        counts[name] = counts.get(name, 0) + made
+                    break
+            else:
+                return
+            if observer is not None:
+                observer.eliminate(before - sum(map(popcount, cands)))
+
+    def _search(
+        self,
+        grid: List[int],
+        cands: List[int],
+        observer: SolverObserver,
+        depth: int,
+    ) -> List[int]:
+        if observer is not None:
+            observer.enter(depth)
+        try:
+            self._deduce(grid, cands, 2)
+        except Contradiction:
+            return []
+        if 0 not in grid:
+            return grid
+        size = self.layout.size
+        cell = min(
+            (c for c in range(len(grid)) if grid[c] == 0),
+            key=lambda c: popcount(cands[c]),
+        )
+        m = cands[cell]
+        for v in range(1, self.layout.size + 1):
+            if not m >> v & 1:
+                continue
+            self.guesses += 1
+            if observer is not None:
+                observer.place(cell // size, cell % size, v, depth)
+            new_grid, new_cands = grid[:], cands[:]
+            try:
+                self._place(new_grid, new_cands, cell, v)
+                solved = self._search(new_grid, new_cands, observer, depth + 1)
+            except Contradiction:
+                solved = []
+            if solved:
+                return solved
+            if observer is not None:
+                observer.backtrack(cell // size, cell % size, v, depth)
+        return []
+
+    def solve_board(
+        self, table: List[List[int]], observer: SolverObserver = None
+    ) -> bool:
+        """Solve an input sudoku board in place, logic first then search
+
+        Parameters
+        ----------
+        table : List[List[int]]
+            the sudoku board, 0 for blanks
+        observer : SolverObserver, optional
+            receives search events and eliminations, by default None
+
+        Returns
+        -------
+        bool
+            True on solved, False on failure
+        """
+        self.techniques = {}
+        self.guesses = 0
+        size = self.layout.size
+        grid = [0] * (size * size)
+        cands = [self.full] * (size * size)
+        try:
+            for r in range(size):
+                for c in range(size):
+                    if table[r][c]:
+                        self._place(grid, cands, r * size + c, table[r][c])
+            if observer is None:
+                self._deduce(grid, cands, len(self._steps), self.techniques)
+            else:
+                with observer.phase("logic"):
+                    self._deduce(
+                        grid, cands, len(self._steps), self.techniques, observer
+                    )
+        except Contradiction:
+            return False
+
+        if 0 in grid:
+            if observer is None:
+                grid = self._search(grid, cands, None, 0)
+            else:
+                with observer.phase("search"):
+                    grid = self._search(grid, cands, observer, 0)
+            if not grid:
+                return False
+        for r in range(size):
+            table[r][:] = grid[r * size : (r + 1) * size]
+        return True
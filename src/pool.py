@@ -0,0 +1,302 @@
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Deque, Dict, List, Sequence, Tuple, Type
+
+from board_gen import BeerGenerator
+from rating import LABELS, DifficultyRater
+from symmetry import random_transform
+
+# DifficultyRater labels that fill each difficulty bucket
+DIFFICULTIES: Dict[str, Tuple[str, ...]] = {
+    "easy": ("easy",),
+    "medium": ("medium",),
+    "hard": ("hard", "expert", "diabolical"),
+}
+# templates carved for one puzzle before giving up on reaching its difficulty
+MAX_TRIES = 50
+# rating labels from easiest to hardest
+LEVELS = [name for _, name in LABELS]
+
+
+def make_puzzle(
+    labels: Sequence[str],
+    generator: Type[BeerGenerator] = BeerGenerator,
+    order: int = None,
+) -> List[List[int]]:
+    """Generate one playable puzzle that DifficultyRater gives one of labels
+
+    A new solved board is carved as far as it goes with carve_board_template. A puzzle rated
+    harder than labels has clues put back, see _ease, and one that misses labels is thrown
+    away for a new board.
+
+    Parameters
+    ----------
+    labels : Sequence[str]
+        rating labels the puzzle may have, such as a value of DIFFICULTIES
+    generator : Type[BeerGenerator], optional
+        generator class to use, by default BeerGenerator
+    order : int, optional
+        box width of the puzzle, by default the generator's ORDER
+
+    Returns
+    -------
+    List[List[int]]
+
+    Raises
+    ------
+    RuntimeError
+        when none of MAX_TRIES solved boards gave a puzzle with one of labels
+    """
+    gen = generator(order=order)
+    rater = DifficultyRater(gen.ORDER)
+    hardest = max(map(LEVELS.index, labels))
+    for _ in range(MAX_TRIES):
+        solution = gen.generate_board()
+        gen.boards = []
+        gen.carve_board_template(solution)
+        # the clues of the template as the solution's ints, so clues can be put back
+        board = [
+            [v if t else 0 for v, t in zip(row, template_row)]
+            for row, template_row in zip(solution, gen.boards[-1])
+        ]
+        board = _ease(board, solution, hardest, rater, gen.rng)
+        if rater.rate(board).label in labels:
+            return random_transform(gen.ORDER, gen.rng).apply(board)
+    raise RuntimeError(f"no {'/'.join(labels)} puzzle in {MAX_TRIES} boards")
+
+
+def _ease(
+    board: List[List[int]],
+    solution: List[List[int]],
+    hardest: int,
+    rater: DifficultyRater,
+    rng: random.Random,
+) -> List[List[int]]:
+    """Put clues back until the board rates no harder than LEVELS[hardest]
+
+    More clues never make a puzzle harder, so the fewest symmetric pairs of clues that
+    bring it down, in a shuffled order, are found by binary search.
+    """
+    if LEVELS.index(rater.rate(board).label) <= hardest:
+        return board
+    size = len(board)
+    cells = size * size
+    pairs = [
+        s for s in range(cells) if s <= cells - 1 - s and not board[s // size][s % size]
+    ]
+    rng.shuffle(pairs)
+
+    def restored(count: int) -> List[List[int]]:
+        ret = [row[:] for row in board]
+        for s in pairs[:count]:
+            for t in (s, cells - 1 - s):
+                ret[t // size][t % size] = solution[t // size][t % size]
+        return ret
+
+    # restored(low) is too hard, restored(high) is the solution which is easy
+    low, high = 0, len(pairs)
+    while high - low > 1:
+        mid = (low + high) // 2
+        if LEVELS.index(rater.rate(restored(mid)).label) <= hardest:
+            high = mid
+        else:
+            low = mid
+    return restored(high)
+
+
+class PuzzlePool:
+    """Keep ready made puzzles for each difficulty so getting one doesn't wait on generation
+
+    When a bucket drops below low_water it is topped back up to size by jobs running
+    on background worker threads or processes. A failed job is made again, up to max_retries
+    failures in a row for a bucket, after that getting from the bucket raises.
+    """
+
+    def __init__(
+        self,
+        size: int = 8,
+        low_water: int = None,
+        difficulties: Dict[str, Sequence[str]] = None,
+        generator: Type[BeerGenerator] = BeerGenerator,
+        workers: int = 1,
+        use_processes: bool = True,
+        max_retries: int = 3,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        size : int, optional
+            puzzles to keep in each bucket, by default 8
+        low_water : int, optional
+            refill a bucket once it holds fewer than this, by default half of size
+        difficulties : Dict[str, Sequence[str]], optional
+            rating labels of the puzzles for each bucket, by default DIFFICULTIES
+        generator : Type[BeerGenerator], optional
+            generator class, by default BeerGenerator
+        workers : int, optional
+            number of background workers, by default 1
+        use_processes : bool, optional
+            generate in processes rather than threads, by default True
+        max_retries : int, optional
+            failed jobs in a row before a bucket is given up on, by default 3
+        """
+        self.size = size
+        self.low_water = size // 2 if low_water is None else low_water
+        self.difficulties = dict(DIFFICULTIES if difficulties is None else difficulties)
+        self.generator = generator
+        self.workers = workers
+        self.use_processes = use_processes
+        self.max_retries = max_retries
+        self._ready: Dict[str, Deque[List[List[int]]]] = {
+            d: deque() for d in self.difficulties
+        }
+        self._pending = {d: 0 for d in self.difficulties}
+        # failed jobs in a row and the last error of each bucket
+        self._failed = {d: 0 for d in self.difficulties}
+        self._error: Dict[str, BaseException] = {}
+        self._cond = threading.Condition()
+        self._executor: Executor = None
+        self.hits = 0
+        self.misses = 0
+        self.refills = 0
+        self.failures = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def start(self) -> "PuzzlePool":
+        """Start the workers and fill every bucket"""
+        if self._executor is None:
+            pool_type = (
+                ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+            )
+            self._executor = pool_type(self.workers)
+            with self._cond:
+                for difficulty in self.difficulties:
+                    self._top_up(difficulty)
+        return self
+
+    def stop(self) -> None:
+        """Stop the workers once running jobs finish, puzzles already made stay in the pool"""
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            executor.shutdown(wait=True)
+
+    def __enter__(self) -> "PuzzlePool":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _top_up(self, difficulty: str) -> None:
+        # call holding self._cond
+        if self._executor is None or self._given_up(difficulty):
+            return
+        have = len(self._ready[difficulty]) + self._pending[difficulty]
+        if len(self._ready[difficulty]) >= self.low_water and have > 0:
+            return
+        for _ in range(self.size - have):
+            self._pending[difficulty] += 1
+            submitted = time.perf_counter()
+            future = self._executor.submit(
+                make_puzzle, self.difficulties[difficulty], self.generator
+            )
+            future.add_done_callback(
+                lambda f, d=difficulty, t=submitted: self._refilled(f, d, t)
+            )
+
+    def _refilled(self, future: Future, difficulty: str, submitted: float) -> None:
+        latency = time.perf_counter() - submitted
+        with self._cond:
+            self._pending[difficulty] -= 1
+            # wake waiters whatever happened, so they can see a bucket was given up on
+            self._cond.notify_all()
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is not None:
+                self.failures += 1
+                self._failed[difficulty] += 1
+                self._error[difficulty] = error
+                self._top_up(difficulty)
+                return
+            self._failed[difficulty] = 0
+            self._ready[difficulty].append(future.result())
+            self.refills += 1
+            self._latency_total += latency
+            self._latency_max = max(self._latency_max, latency)
+
+    def _given_up(self, difficulty: str) -> bool:
+        return self._failed[difficulty] > self.max_retries
+
+    def get(
+        self, difficulty: str = "medium", block: bool = True, timeout: float = None
+    ) -> List[List[int]]:
+        """Take a ready puzzle from a bucket
+
+        Parameters
+        ----------
+        difficulty : str, optional
+            bucket to take from, by default "medium"
+        block : bool, optional
+            on a miss wait for the next puzzle to be made, by default True
+        timeout : float, optional
+            most seconds to wait on a miss, by default no limit
+
+        Returns
+        -------
+        List[List[int]]
+
+        Raises
+        ------
+        queue.Empty
+            on a miss when not blocking, or when the timeout runs out
+        RuntimeError
+            on a miss once making puzzles for the bucket has failed more than max_retries
+            times in a row
+        """
+        if difficulty not in self._ready:
+            raise KeyError(f"unknown difficulty {difficulty!r}")
+        ready = self._ready[difficulty]
+        with self._cond:
+            if ready:
+                self.hits += 1
+            else:
+                self.misses += 1
+                self._top_up(difficulty)
+                if block:
+                    self._cond.wait_for(
+                        lambda: ready or self._given_up(difficulty), timeout
+                    )
+                if not ready and self._given_up(difficulty):
+                    raise RuntimeError(
+                        f"making {difficulty} puzzles failed "
+                        f"{self._failed[difficulty]} times in a row"
+                    ) from self._error[difficulty]
+                if not ready:
+                    raise queue.Empty(f"no {difficulty} puzzle ready")
+            board = ready.popleft()
+            self._top_up(difficulty)
+        return board
+
+    def stats(self) -> dict:
+        """Hit, miss and failure counts, refill latency and how full each bucket is"""
+        with self._cond:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "refills": self.refills,
+                "failures": self.failures,
+                "given_up": [d for d in self.difficulties if self._given_up(d)],
+                "refill_latency_mean": (
+                    self._latency_total / self.refills if self.refills else 0.0
+                ),
+                "refill_latency_max": self._latency_max,
+                "ready": {d: len(r) for d, r in self._ready.items()},
+                "pending": dict(self._pending),
+            }
@@ -0,0 +1,175 @@
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from board_util import board_order
+from dlx import DLXSolver
+from logic import layout
+
+# status of each board after propagation
+INVALID = -1
+STUCK = 0
+SOLVED = 1
+
+
+@lru_cache(maxsize=None)
+def unit_tables(order: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+    """Index tables for the rows, columns and boxes of a board, logic.layout as arrays
+
+    Parameters
+    ----------
+    order : int, optional
+        box width of the board, by default 3
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        units of shape (3 * size, size) holding the flat cell indices of each unit,
+        and cell_units of shape (size * size, 3) holding the units each cell is in
+    """
+    lay = layout(order)
+    size = lay.size
+    cell_units = [
+        (cell // size, size + cell % size, 2 * size + box)
+        for cell, box in enumerate(lay.cell_box)
+    ]
+    return np.array(lay.units), np.array(cell_units)
+
+
+def to_candidates(boards: np.ndarray) -> np.ndarray:
+    """Turn boards into boolean candidate arrays
+
+    Parameters
+    ----------
+    boards : np.ndarray
+        ints of shape (N, size, size), 0 for blanks
+
+    Returns
+    -------
+    np.ndarray
+        bools of shape (N, size * size, size), [n, cell, v - 1] is True when v can go in cell.
+        Givens only allow their own value, blanks allow every value.
+    """
+    n, size = boards.shape[0], boards.shape[1]
+    flat = boards.reshape(n, size * size)
+    cands = np.ones((n, size * size, size), dtype=bool)
+    given = flat != 0
+    cands[given] = False
+    rows, cells = np.nonzero(given)
+    cands[rows, cells, flat[given] - 1] = True
+    return cands
+
+
+def from_candidates(cands: np.ndarray) -> np.ndarray:
+    """Turn candidate arrays back into boards, cells with more than one choice are left as 0
+
+    Parameters
+    ----------
+    cands : np.ndarray
+        bools of shape (N, size * size, size)
+
+    Returns
+    -------
+    np.ndarray
+        ints of shape (N, size, size)
+    """
+    n, cells, size = cands.shape
+    single = cands.sum(axis=2) == 1
+    values = np.where(single, cands.argmax(axis=2) + 1, 0)
+    return values.reshape(n, size, size)
+
+
+def propagate(cands: np.ndarray, order: int = 3) -> np.ndarray:
+    """Run naked and hidden singles on every board until none of them change, in place
+
+    Each step works on all the boards still changing at once:
+    a solved cell removes its value from every cell sharing a unit (naked singles),
+    and a value with only one place left in a unit is fixed there (hidden singles).
+
+    Parameters
+    ----------
+    cands : np.ndarray
+        bools of shape (N, size * size, size), see to_candidates
+    order : int, optional
+        box width of the boards, by default 3
+
+    Returns
+    -------
+    np.ndarray
+        status of each board - SOLVED, STUCK or INVALID
+    """
+    units, cell_units = unit_tables(order)
+    status = np.full(cands.shape[0], STUCK, dtype=np.int8)
+    active = np.arange(cands.shape[0])
+    while active.size:
+        c = cands[active]
+        before = c.copy()
+
+        # naked singles
+        solved = c.sum(axis=2) == 1
+        placed = c & solved[:, :, None]
+        unit_placed = placed[:, units].sum(axis=2)  # (n, units, size)
+        clash = (unit_placed > 1).any(axis=(1, 2))
+        elim = (unit_placed[:, cell_units] > 0).any(axis=2)  # (n, cells, size)
+        c &= ~elim | solved[:, :, None]
+
+        # hidden singles
+        unit_counts = c[:, units].sum(axis=2)
+        only = (unit_counts[:, cell_units] == 1).any(axis=2) & c
+        forced = only.any(axis=2)
+        c[forced] = only[forced]
+
+        counts = c.sum(axis=2)
+        dead = (
+            clash
+            | (counts == 0).any(axis=1)
+            | (c[:, units].sum(axis=2) == 0).any(axis=(1, 2))
+        )
+        done = ~dead & (counts == 1).all(axis=1)
+        changed = (c != before).any(axis=(1, 2))
+
+        cands[active] = c
+        status[active[dead]] = INVALID
+        status[active[done]] = SOLVED
+        active = active[changed & ~dead & ~done]
+    return status
+
+
+def solve_boards(
+    boards: Sequence[List[List[int]]], order: int = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Solve many boards, propagating all of them together then searching the rest one at a time
+
+    Parameters
+    ----------
+    boards : Sequence[List[List[int]]]
+        boards of ints, 0 for blanks
+    order : int, optional
+        box width of the boards, by default board_order of the first one
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        solved boards of shape (N, size, size), and whether each board was solved.
+        Boards that failed keep whatever propagation filled in.
+    """
+    arr = np.asarray(boards, dtype=np.int64)
+    if arr.ndim == 2:
+        arr = arr[None]
+    if order is None:
+        order = board_order(arr[0])
+    cands = to_candidates(arr)
+    status = propagate(cands, order)
+    result = from_candidates(cands)
+    ok = status == SOLVED
+
+    stuck = np.flatnonzero(status == STUCK)
+    if stuck.size:
+        solver = DLXSolver(order)
+        for i in stuck:
+            table = result[i].tolist()
+            if solver.solve_board(table):
+                result[i] = table
+                ok[i] = True
+    return result, ok
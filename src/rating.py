@@ -0,0 +1,128 @@
+import math
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Sequence, Tuple, Union
+
+from logic import LogicSolver
+from symmetry import canonicalize
+
+# how hard each technique is for a person, on the scale used by Sudoku Explainer
+WEIGHTS = {
+    "hidden_single": 1.5,
+    "naked_single": 2.3,
+    "pointing": 2.6,
+    "claiming": 2.8,
+    "naked_pair": 3.0,
+    "x_wing": 3.2,
+    "hidden_pair": 3.4,
+    "naked_triple": 3.6,
+    "swordfish": 3.8,
+    "hidden_triple": 4.0,
+}
+# level of a puzzle logic can't finish, raised further by the number of guesses
+SEARCH_LEVEL = 5.0
+
+# highest level for each label, checked in order
+LABELS = (
+    (1.5, "easy"),
+    (2.3, "medium"),
+    (3.0, "hard"),
+    (4.0, "expert"),
+    (math.inf, "diabolical"),
+)
+# label of a puzzle with no solution, such as one whose clues clash
+INVALID = "invalid"
+
+
+class Rating(NamedTuple):
+    """Difficulty of one puzzle"""
+
+    score: int  # level then steps, for sorting puzzles
+    level: float  # weight of the hardest technique, or above SEARCH_LEVEL with guesses
+    label: str
+    hardest: str  # hardest technique needed, "search" when logic alone wasn't enough
+    steps: int  # times any technique made progress
+    guesses: int
+    solvable: bool
+
+
+class DifficultyRater:
+    """Rate puzzles by the techniques a person would need to solve them
+
+    The level is the weight of the hardest technique LogicSolver needed. If logic gets stuck
+    the level starts at SEARCH_LEVEL and rises with the number of guesses the search made.
+    A puzzle with no solution is labeled INVALID whatever its level.
+    Ratings are memoized by canonical form, so every relabeled, rotated or shuffled copy of a
+    puzzle is only rated once, and the canonical copy is what gets rated so they all agree.
+    """
+
+    def __init__(self, order: int = 3, maxsize: int = 100_000) -> None:
+        """
+        Parameters
+        ----------
+        order : int, optional
+            box width of the boards to rate, by default 3
+        maxsize : int, optional
+            most ratings to remember, least recently used go first, by default 100_000
+        """
+        self.solver = LogicSolver(order)
+        self.maxsize = maxsize
+        self._memo: "OrderedDict[Tuple[int, ...], Rating]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def rate(self, board: Sequence[Sequence[Union[int, str]]]) -> Rating:
+        """Rate a puzzle, ints or letter placeholders for clues and 0 for blanks
+
+        Parameters
+        ----------
+        board : Sequence[Sequence[int | str]]
+
+        Returns
+        -------
+        Rating
+        """
+        key, _ = canonicalize(board)
+        rating = self._memo.get(key)
+        if rating is not None:
+            self.hits += 1
+            self._memo.move_to_end(key)
+            return rating
+        self.misses += 1
+        rating = self._rate_form(key)
+        self._memo[key] = rating
+        if len(self._memo) > self.maxsize:
+            self._memo.popitem(last=False)
+        return rating
+
+    def _rate_form(self, form: Tuple[int, ...]) -> Rating:
+        size = self.solver.layout.size
+        table: List[List[int]] = [
+            list(form[i : i + size]) for i in range(0, size * size, size)
+        ]
+        solvable = self.solver.solve_board(table)
+        counts: Dict[str, int] = self.solver.techniques
+        guesses = self.solver.guesses
+        steps = sum(counts.values())
+        hardest = max(counts, key=WEIGHTS.__getitem__, default="")
+        level = WEIGHTS.get(hardest, 0.0)
+        if guesses:
+            hardest = "search"
+            level = SEARCH_LEVEL + math.log2(1 + guesses) / 2
+        label = next(name for top, name in LABELS if level <= top)
+        if not solvable:
+            label = INVALID
+        # each step takes out at least one of the size ** 3 candidates, so no number of steps
+        # reaches the next hundredth of a level
+        return Rating(
+            round(level * 100) * (size**3 + 1) + steps,
+            round(level, 2),
+            label,
+            hardest,
+            steps,
+            guesses,
+            solvable,
+        )
+
+    def stats(self) -> dict:
+        """Memo hits, misses and size"""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._memo)}
@@ -0,0 +1,197 @@
+import mmap
+import os
+from typing import Callable, Iterator, List, NamedTuple, Optional, Union
+
+FORMATS = ("auto", "rows", "line")
+BLANKS = ".0"
+
+
+class ReadError(NamedTuple):
+    """A malformed record found while reading"""
+
+    line: int  # 1 based line number the record starts on
+    message: str
+
+
+class BoardReader:
+    """Lazily read boards from a file, yielding one board at a time
+
+    Two plaintext formats are understood, and can be mixed in one file with fmt="auto"
+    - rows: 9 lines of 9 elements separated by a space, 0 for blanks.
+      Letters are kept as string placeholders like the stored templates.
+    - line: a single line of 81 characters, . or 0 for blanks
+
+    Blank lines and lines starting with # are skipped, a blank line or a line format board
+    also ends a rows board, so one missing a row doesn't take a row of the next. Boards written
+    back to back, like Boards/new_boards.txt, have nothing to end a short one, so it takes the
+    first row of the next board. The board that makes is skipped when its clues clash, which
+    is likely but not certain, so only blank lines between boards recover every one. A malformed
+    record is skipped and recorded in self.errors with its line number, the rest of the file
+    is still read.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        fmt: str = "auto",
+        use_mmap: bool = False,
+        on_error: Optional[Callable[[ReadError], None]] = None,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        filename : str
+            path to the plaintext file
+        fmt : str, optional
+            one of FORMATS, by default "auto" which works out the format of each record
+        use_mmap : bool, optional
+            memory-map the file instead of reading it through a buffer, by default False
+        on_error : Callable[[ReadError], None], optional
+            called with each malformed record as it is found, by default None
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown format {fmt!r}, expected one of {FORMATS}")
+        self.filename = filename
+        self.fmt = fmt
+        self.use_mmap = use_mmap
+        self.on_error = on_error
+        self.errors: List[ReadError] = []
+
+    def _error(self, line: int, message: str) -> None:
+        err = ReadError(line, message)
+        self.errors.append(err)
+        if self.on_error is not None:
+            self.on_error(err)
+
+    def _lines(self) -> Iterator[str]:
+        if not self.use_mmap:
+            with open(self.filename, "r") as fp:
+                yield from fp
+            return
+        with open(self.filename, "rb") as fp:
+            if os.fstat(fp.fileno()).st_size == 0:
+                return  # can't map an empty file
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for raw in iter(mm.readline, b""):
+                    yield raw.decode("ascii", errors="replace")
+
+    @staticmethod
+    def parse_token(token: str) -> Union[int, str]:
+        """Read one element of a rows format board
+
+        Raises ValueError if the token isn't a digit or a single letter
+        """
+        if token.isdigit():
+            return int(token)
+        if len(token) == 1 and token.isalpha():
+            return token
+        raise ValueError(f"bad cell {token!r}")
+
+    @staticmethod
+    def parse_line(text: str) -> List[List[int]]:
+        """Read a line format board
+
+        Raises ValueError if the line isn't 81 digits and blanks
+        """
+        if len(text) != 81:
+            raise ValueError(f"expected 81 cells, found {len(text)}")
+        cells = []
+        for ch in text:
+            if ch in BLANKS:
+                cells.append(0)
+            elif ch.isdigit():
+                cells.append(int(ch))
+            else:
+                raise ValueError(f"bad cell {ch!r}")
+        return [cells[i : i + 9] for i in range(0, 81, 9)]
+
+    @staticmethod
+    def clashes(rows: List[List[Union[int, str]]]) -> bool:
+        """Whether a clue is repeated in a row, column or box of a 9x9 board"""
+        seen = set()
+        for y, row in enumerate(rows):
+            for x, v in enumerate(row):
+                if not v:
+                    continue
+                for unit in (("row", y), ("col", x), ("box", y // 3 * 3 + x // 3)):
+                    if (unit, v) in seen:
+                        return True
+                    seen.add((unit, v))
+        return False
+
+    def __iter__(self) -> Iterator[List[List[Union[int, str]]]]:
+        rows: List[List[Union[int, str]]] = []
+        start = 0  # line the current rows record started on
+        seen = 0  # lines read of the current rows record
+        bad = False  # the current rows record is being skipped
+        for number, raw in enumerate(self._lines(), start=1):
+            text = raw.strip()
+            if text.startswith("#"):
+                continue
+            tokens = text.split()
+            whole = len(tokens) == 1 and len(text) > 9  # a board on one line, not a row
+            if seen and (not tokens or whole):
+                # a blank line or a line board ends a rows record, even one that is short
+                if not bad:
+                    self._error(start, f"expected 9 rows, found {seen}")
+                rows, seen = [], 0
+            if not tokens:
+                continue
+            if whole and self.fmt == "rows":
+                self._error(number, "expected 9 cells, found a single line")
+                continue
+
+            if seen == 0 and self.fmt != "rows":
+                if whole or self.fmt == "line" and len(tokens) == 1:
+                    try:
+                        yield self.parse_line(text)
+                    except ValueError as e:
+                        self._error(number, str(e))
+                    continue
+                if self.fmt == "line":
+                    self._error(number, "expected a single 81 character line")
+                    continue
+
+            if seen == 0:
+                start, bad = number, False
+            seen += 1
+            if not bad:
+                try:
+                    if len(tokens) != 9:
+                        raise ValueError(
+                            f"expected 9 cells on line {number}, found {len(tokens)}"
+                        )
+                    rows.append([self.parse_token(t) for t in tokens])
+                except ValueError as e:
+                    # keep reading the rest of the record so the next board starts in step
+                    self._error(start, str(e))
+                    bad = True
+            if seen == 9:
+                if not bad and self.clashes(rows):
+                    self._error(start, "clues clash, a row may be missing")
+                elif not bad:
+                    yield rows
+                rows, seen = [], 0
+        if seen:
+            self._error(start, "file ended part way through a board")
+
+
+def read_boards(
+    filename: str, fmt: str = "auto", use_mmap: bool = False
+) -> Iterator[List[List[Union[int, str]]]]:
+    """Shortcut for iterating a BoardReader when errors aren't needed
+
+    Parameters
+    ----------
+    filename : str
+        path to the plaintext file
+    fmt : str, optional
+        one of FORMATS, by default "auto"
+    use_mmap : bool, optional
+        memory-map the file, by default False
+
+    Returns
+    -------
+    Iterator[List[List[int | str]]]
+    """
+    return iter(BoardReader(filename, fmt, use_mmap))
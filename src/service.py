@@ -0,0 +1,409 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import time
+from collections import deque
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Deque, Dict, List, Set, Tuple
+
+from batch import to_int_board
+from board_gen import BeerGenerator, board_order
+from dlx import DLXSolver
+from logic import LogicSolver
+from pool import DIFFICULTIES, make_puzzle
+from rating import DifficultyRater
+from reader import BoardReader
+from sat import SATSolver
+
+OPS = ("solve", "rate", "generate", "metrics")
+# the naive solver isn't offered, a hard board keeps it busy far past any timeout
+SOLVERS = ("dlx", "logic", "sat")
+ORDERS = (3, 4, 5)
+# latencies kept for each op to work out percentiles from
+LATENCY_WINDOW = 1000
+PERCENTILES = (50, 90, 99)
+
+# solvers and raters of a worker process, made on first use so DLX links and rating memos
+# are reused. They keep the state of a solve on themselves, a worker runs one job at a time
+_solvers: Dict[Tuple[str, int], Any] = {}
+_raters: Dict[int, DifficultyRater] = {}
+
+
+class RequestError(Exception):
+    """A request that can't be served, the message is sent back to the client"""
+
+
+def read_board(value: Any) -> List[List[int]]:
+    """Read the board of a request
+
+    Parameters
+    ----------
+    value : Any
+        rows of ints, digit strings or letter placeholders with 0 for blanks,
+        or a 9x9 board as one line of 81 characters
+
+    Returns
+    -------
+    List[List[int]]
+
+    Raises
+    ------
+    RequestError
+        when value isn't a 9x9, 16x16 or 25x25 board
+    """
+    try:
+        if isinstance(value, str):
+            return BoardReader.parse_line(value)
+        if not isinstance(value, list) or not all(isinstance(r, list) for r in value):
+            raise ValueError("board must be a list of rows or a line of 81 characters")
+        board = to_int_board(value)
+    except ValueError as err:
+        raise RequestError(str(err)) from None
+    size = len(board)
+    if board_order(board) not in ORDERS or board_order(board) ** 2 != size:
+        raise RequestError("board must be 9x9, 16x16 or 25x25")
+    for row in board:
+        if len(row) != size:
+            raise RequestError("board must be square")
+        for cell in row:
+            if type(cell) is not int or not 0 <= cell <= size:
+                raise RequestError(f"bad cell {cell!r}")
+    return board
+
+
+def _solve(board: List[List[int]], solver: str) -> Tuple[bool, List[List[int]]]:
+    key = (solver, board_order(board))
+    if key not in _solvers:
+        if solver == "dlx":
+            _solvers[key] = DLXSolver(key[1])
+        elif solver == "logic":
+            _solvers[key] = LogicSolver(key[1])
+        else:
+            _solvers[key] = SATSolver(key[1])
+    return _solvers[key].solve_board(board), board
+
+
+def _rate(board: List[List[int]]) -> dict:
+    order = board_order(board)
+    if order not in _raters:
+        _raters[order] = DifficultyRater(order)
+    return _raters[order].rate(board)._asdict()
+
+
+def _work(conn: Connection) -> None:
+    # loop of a worker process, runs (func, args) jobs until the service closes its end
+    while True:
+        try:
+            func, args = conn.recv()
+        except EOFError:
+            return
+        try:
+            reply = (True, func(*args))
+        except Exception as err:
+            reply = (False, err)
+        conn.send(reply)
+
+
+class _Worker:
+    """A worker process and the pipe its jobs go over"""
+
+    def __init__(self) -> None:
+        self.conn, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_work, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    def stop(self) -> None:
+        """Kill the process, whatever it is doing"""
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class SudokuService:
+    """Local JSON lines service that solves, rates and generates puzzles
+
+    Each request is one line of JSON with an "op" of solve, rate, generate or metrics, and an
+    optional "id" echoed back in the response. Solve takes a "solver" of SOLVERS, by default
+    sat for 25x25 boards and dlx for the rest. Responses are one line of JSON each, with "ok"
+    false and an "error" message when a request fails, and can come back out of order.
+
+        {"id": 1, "op": "solve", "board": "530070000600195000...", "solver": "dlx"}
+        {"id": 2, "op": "rate", "board": [[5, 3, 0, ...], ...]}
+        {"id": 3, "op": "generate", "difficulty": "hard", "order": 3}
+        {"id": 4, "op": "metrics"}
+
+    Solving, rating and generating run on worker processes, one job at a time each. A
+    connection stops being read while max_inflight of its requests are running, so a fast
+    client is slowed down by TCP flow control instead of queueing work without bound. A job
+    still running at its timeout is answered with an error and its worker is killed and
+    replaced, so a hard board can't hold a worker after its client has given up.
+    """
+
+    def __init__(
+        self,
+        workers: int = None,
+        timeout: float = 30.0,
+        max_inflight: int = 8,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        workers : int, optional
+            number of worker processes, by default one per cpu
+        timeout : float, optional
+            most seconds a request waits on a worker, by default 30.0
+        max_inflight : int, optional
+            requests of one connection running at once, by default 8
+        """
+        self.workers = workers
+        self.timeout = timeout
+        self.max_inflight = max_inflight
+        self._idle: "asyncio.Queue[_Worker]" = None
+        self._busy: Set[_Worker] = set()
+        self._server: asyncio.AbstractServer = None
+        self.connections = 0
+        self.inflight = 0  # requests being handled
+        self.queued = 0  # jobs waiting for a worker or running
+        self.requests = {op: 0 for op in OPS}
+        self.errors = 0
+        self.timeouts = 0
+        self.restarts = 0  # workers killed and replaced
+        self._latency: Dict[str, Deque[float]] = {
+            op: deque(maxlen=LATENCY_WINDOW) for op in OPS
+        }
+
+    async def start(
+        self, host: str = "127.0.0.1", port: int = 8765, path: str = None
+    ) -> asyncio.AbstractServer:
+        """Start the workers and listen on host and port, or on a Unix socket at path"""
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for _ in range(self.workers or multiprocessing.cpu_count()):
+                self._idle.put_nowait(_Worker())
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._handle, path=path)
+        else:
+            self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server
+
+    async def close(self) -> None:
+        """Stop listening and stop the workers, jobs still running are killed"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._idle is not None:
+            idle, self._idle = self._idle, None
+            workers = list(self._busy)
+            while not idle.empty():
+                workers.append(idle.get_nowait())
+            loop = asyncio.get_running_loop()
+            for worker in workers:
+                await loop.run_in_executor(None, worker.stop)
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self.connections += 1
+        slots = asyncio.Semaphore(self.max_inflight)
+        write_lock = asyncio.Lock()
+        tasks: Set[asyncio.Future] = set()
+        try:
+            while True:
+                # don't read more until one of this connection's requests is done
+                await slots.acquire()
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    slots.release()
+                    await self._send(
+                        writer, write_lock, self._error(None, "line too long")
+                    )
+                    break
+                except ConnectionError:
+                    slots.release()
+                    break
+                if not line:
+                    slots.release()
+                    break
+                task = asyncio.ensure_future(self._respond(line, writer, write_lock))
+                task.add_done_callback(lambda _: slots.release())
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def _respond(
+        self, line: bytes, writer: asyncio.StreamWriter, write_lock: asyncio.Lock
+    ) -> None:
+        self.inflight += 1
+        start = time.perf_counter()
+        request_id = None
+        op = None
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError as err:
+                raise RequestError(f"bad JSON: {err}") from None
+            if not isinstance(request, dict):
+                raise RequestError("request must be a JSON object")
+            request_id = request.get("id")
+            op = request.get("op")
+            if op not in OPS:
+                raise RequestError(f"unknown op {op!r}, expected one of {OPS}")
+            self.requests[op] += 1
+            response = {"id": request_id, "ok": True, **await self._dispatch(request)}
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            response = self._error(request_id, f"timed out after {self.timeout}s")
+        except RequestError as err:
+            response = self._error(request_id, str(err))
+        except Exception as err:  # a failed job shouldn't take the connection down
+            response = self._error(request_id, f"{type(err).__name__}: {err}")
+        finally:
+            self.inflight -= 1
+        if op in self._latency:
+            self._latency[op].append(time.perf_counter() - start)
+        try:
+            await self._send(writer, write_lock, response)
+        except ConnectionError:
+            pass  # the client went away, nothing to answer
+
+    def _error(self, request_id: Any, message: str) -> dict:
+        self.errors += 1
+        return {"id": request_id, "ok": False, "error": message}
+
+    @staticmethod
+    async def _send(
+        writer: asyncio.StreamWriter, write_lock: asyncio.Lock, response: dict
+    ) -> None:
+        # one drain at a time, concurrent drains on one writer aren't allowed
+        async with write_lock:
+            writer.write(json.dumps(response).encode() + b"\n")
+            await writer.drain()
+
+    async def _dispatch(self, request: dict) -> dict:
+        op = request["op"]
+        if op == "metrics":
+            return self.metrics()
+        if op == "solve":
+            board = read_board(request.get("board"))
+            # DLX can search for minutes on a sparse 25x25 board, clause learning can't
+            solver = request.get("solver", "sat" if board_order(board) == 5 else "dlx")
+            if solver not in SOLVERS:
+                raise RequestError(
+                    f"unknown solver {solver!r}, expected one of {SOLVERS}"
+                )
+            solved, board = await self._run(_solve, board, solver)
+            return {"status": "solved" if solved else "unsolvable", "board": board}
+        if op == "rate":
+            return {"rating": await self._run(_rate, read_board(request.get("board")))}
+        # generate
+        difficulty = request.get("difficulty", "medium")
+        if difficulty not in DIFFICULTIES:
+            raise RequestError(
+                f"unknown difficulty {difficulty!r}, expected one of {tuple(DIFFICULTIES)}"
+            )
+        order = request.get("order", 3)
+        if order not in ORDERS:
+            raise RequestError(f"order must be one of {ORDERS}")
+        board = await self._run(
+            make_puzzle, DIFFICULTIES[difficulty], BeerGenerator, order
+        )
+        return {"board": board}
+
+    async def _run(self, func: Callable, *args) -> Any:
+        if self._idle is None:
+            raise RequestError("service is shutting down")
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        self.queued += 1
+        try:
+            worker = await asyncio.wait_for(self._idle.get(), self.timeout)
+            self._busy.add(worker)
+            try:
+                worker.conn.send((func, args))
+                # recv blocks, wait on it in a thread. Killing the worker ends the wait
+                ok, value = await asyncio.wait_for(
+                    loop.run_in_executor(None, worker.conn.recv),
+                    max(0.0, deadline - loop.time()),
+                )
+            except BaseException:
+                # timed out or cancelled, the job may still be running
+                self._busy.discard(worker)
+                worker.stop()
+                if self._idle is not None:
+                    self._idle.put_nowait(_Worker())
+                    self.restarts += 1
+                raise
+            self._busy.discard(worker)
+            if self._idle is not None:
+                self._idle.put_nowait(worker)
+            else:
+                worker.stop()
+        finally:
+            self.queued -= 1
+        if not ok:
+            raise value
+        return value
+
+    def metrics(self) -> dict:
+        """Counters, queue depth and latency percentiles in seconds for each op"""
+        latency = {}
+        for op, window in self._latency.items():
+            times = sorted(window)
+            latency[op] = {"count": len(times)}
+            for p in PERCENTILES:
+                # nearest rank
+                latency[op][f"p{p}"] = (
+                    times[max(0, -(-p * len(times) // 100) - 1)] if times else 0.0
+                )
+        return {
+            "connections": self.connections,
+            "inflight": self.inflight,
+            "queue_depth": self.queued,
+            "requests": dict(self.requests),
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "restarts": self.restarts,
+            "latency": latency,
+        }
+
+
+async def serve(args: argparse.Namespace) -> None:
+    service = SudokuService(args.workers, args.timeout, args.max_inflight)
+    server = await service.start(args.host, args.port, args.unix)
+    where = args.unix or f"{args.host}:{args.port}"
+    print(f"serving on {where}")
+    try:
+        await server.serve_forever()
+    finally:
+        await service.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Serve solve, rate and generate requests as JSON lines"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("-p", "--port", type=int, default=8765)
+    parser.add_argument(
+        "--unix", metavar="PATH", help="listen on a Unix socket instead"
+    )
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    parser.add_argument("-t", "--timeout", type=float, default=30.0)
+    parser.add_argument("--max-inflight", type=int, default=8)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
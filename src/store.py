@@ -0,0 +1,187 @@
+import argparse
+import mmap
+import os
+import random
+import struct
+from typing import Iterable, Iterator, List, Optional, Union
+
+from board_util import board_order, load_pickled_boards
+
+MAGIC = b"SDKT"
+# extension of store files, a generator given a path with it that doesn't exist starts one
+SUFFIX = ".sdk"
+VERSION = 1
+# magic, version, order, reserved
+HEADER = struct.Struct("<4sBBH")
+
+
+class TemplateStore:
+    """Fixed width binary file of board templates, read through mmap
+
+    After an 8 byte header every template is packed into the same number of bytes,
+    each cell holding 0 for a blank or the placeholder number (a is 1, b is 2, ...).
+    A 9x9 board uses 4 bits per cell, 41 bytes per template.
+    Templates are found by offset so nothing is loaded up front,
+    and new templates are appended to the end of the file.
+    """
+
+    def __init__(self, filename: str, order: int = 3) -> None:
+        """
+        Parameters
+        ----------
+        filename : str
+            path to the store, created with an empty header if it doesn't exist
+        order : int, optional
+            box width of the boards for a new store, by default 3.
+            An existing store uses the order in its header.
+        """
+        self.filename = filename
+        if not os.path.isfile(filename):
+            with open(filename, "wb") as fp:
+                fp.write(HEADER.pack(MAGIC, VERSION, order, 0))
+        with open(filename, "rb") as fp:
+            magic, version, order, _ = HEADER.unpack(fp.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{filename} is not a version {VERSION} template store")
+        self.order = order
+        self.size = order * order
+        self.cells = self.size * self.size
+        self.bits = self.size.bit_length()
+        self.record = (self.cells * self.bits + 7) // 8
+        self._pad = self.record * 8 - self.cells * self.bits
+        self._count = (os.path.getsize(filename) - HEADER.size) // self.record
+        self._fp = None
+        self._mm: Optional[mmap.mmap] = None
+
+    @staticmethod
+    def is_store(filename: str) -> bool:
+        """Check whether a file is a template store by its magic bytes"""
+        if not os.path.isfile(filename):
+            return False
+        with open(filename, "rb") as fp:
+            return fp.read(len(MAGIC)) == MAGIC
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _map(self) -> mmap.mmap:
+        if self._mm is None:
+            self._fp = open(self.filename, "rb")
+            self._mm = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mm
+
+    def close(self) -> None:
+        """Unmap the file, it is mapped again on the next read"""
+        if self._mm is not None:
+            self._mm.close()
+            self._fp.close()
+            self._mm = None
+            self._fp = None
+
+    def pack(self, board: List[List[Union[int, str]]]) -> bytes:
+        """Pack a board into one record
+
+        Letters are stored as their place in the alphabet, ints as themselves.
+
+        Raises
+        ------
+        ValueError
+            when the board isn't size rows of size cells, or a cell can't be stored
+        """
+        # a short or ragged board would pack into a record that reads back shifted
+        if len(board) != self.size or any(len(row) != self.size for row in board):
+            raise ValueError(
+                f"can't store a board that isn't {self.size}x{self.size} "
+                f"in an order {self.order} store"
+            )
+        value = 0
+        for row in board:
+            for cell in row:
+                if isinstance(cell, str):
+                    cell = ord(cell) - ord("a") + 1
+                if not 0 <= cell <= self.size:
+                    raise ValueError(f"can't store cell {cell!r}")
+                value = (value << self.bits) | cell
+        return (value << self._pad).to_bytes(self.record, "big")
+
+    def unpack(self, data: bytes) -> List[List[Union[int, str]]]:
+        """Unpack one record into a template, 0 for blanks and letters for clues"""
+        value = int.from_bytes(data, "big") >> self._pad
+        mask = (1 << self.bits) - 1
+        cells: List[Union[int, str]] = []
+        for _ in range(self.cells):
+            cells.append(value & mask)
+            value >>= self.bits
+        cells.reverse()
+        cells = [chr(ord("a") + c - 1) if c else 0 for c in cells]
+        return [cells[i : i + self.size] for i in range(0, self.cells, self.size)]
+
+    def __getitem__(self, index: int) -> List[List[Union[int, str]]]:
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("template index out of range")
+        start = HEADER.size + index * self.record
+        return self.unpack(self._map()[start : start + self.record])
+
+    def __iter__(self) -> Iterator[List[List[Union[int, str]]]]:
+        for i in range(self._count):
+            yield self[i]
+
+    def random(self) -> List[List[Union[int, str]]]:
+        """Read a random template, a fresh list each call"""
+        return self[random.randrange(self._count)]
+
+    def extend(self, boards: Iterable[List[List[Union[int, str]]]]) -> None:
+        """Append templates to the end of the file without rewriting it
+
+        Every board is packed before anything is written, so a bad one leaves the file as
+        it was, see pack.
+        """
+        data = b"".join(self.pack(b) for b in boards)
+        with open(self.filename, "ab") as fp:
+            fp.write(data)
+        # the map is only as long as the file was, remap on the next read
+        self.close()
+        self._count += len(data) // self.record
+
+    def append(self, board: List[List[Union[int, str]]]) -> None:
+        self.extend([board])
+
+    @classmethod
+    def from_pickle(cls, pkl_file: str, out_file: str) -> "TemplateStore":
+        """Convert a pickled list of templates, like Boards/board.pkl, to a store
+
+        Parameters
+        ----------
+        pkl_file : str
+            path to the pickled templates
+        out_file : str
+            path of the store to append them to
+
+        Returns
+        -------
+        TemplateStore
+        """
+        boards = load_pickled_boards(pkl_file)
+        order = board_order(boards[0]) if boards else 3
+        store = cls(out_file, order)
+        store.extend(boards)
+        return store
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Manage binary template stores")
+    sub = parser.add_subparsers(dest="command", required=True)
+    convert = sub.add_parser("convert", help="convert pickled templates to a store")
+    convert.add_argument("pickle", help="pickled templates, e.g. Boards/board.pkl")
+    convert.add_argument("store", help="store to append the templates to")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        store = TemplateStore.from_pickle(args.pickle, args.store)
+        print(f"{args.store} holds {len(store)} templates")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+import hashlib
+import random
+from itertools import islice, permutations, product
+from typing import (
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+from board_util import board_order
+
+Cell = Union[int, str]
+
+# orderings carried from one row to the next by canonicalize, past this many ties it keeps
+# the first ones and the form is no longer the same for every board of the class
+MAX_STATES = 50000
+
+
+class Transform(NamedTuple):
+    """A validity-preserving rearrangement of a board
+
+    Applying it transposes the board if transpose is set, then puts old row rows[i] at row i,
+    old column cols[j] at column j and replaces every clue through labels.
+    """
+
+    transpose: bool
+    rows: Tuple[int, ...]
+    cols: Tuple[int, ...]
+    labels: Dict[Hashable, Cell]
+
+    def apply(self, board: Sequence[Sequence[Cell]]) -> List[List[Cell]]:
+        """Return a transformed copy of board, blanks stay 0"""
+        if self.transpose:
+            board = list(zip(*board))
+        labels = self.labels
+        return [
+            [
+                labels.get(board[r][c], board[r][c]) if board[r][c] != 0 else 0
+                for c in self.cols
+            ]
+            for r in self.rows
+        ]
+
+    def inverse(self) -> "Transform":
+        """The transform that undoes this one"""
+        rows = [0] * len(self.rows)
+        for i, r in enumerate(self.rows):
+            rows[r] = i
+        cols = [0] * len(self.cols)
+        for j, c in enumerate(self.cols):
+            cols[c] = j
+        labels = {v: k for k, v in self.labels.items()}
+        if self.transpose:
+            # undoing the permutation before transposing back swaps the roles of rows and cols
+            return Transform(True, tuple(cols), tuple(rows), labels)
+        return Transform(False, tuple(rows), tuple(cols), labels)
+
+
+def random_transform(
+    order: int = 3, rng: random.Random = None, symbols: Sequence[Cell] = None
+) -> Transform:
+    """Pick a random element of the sudoku symmetry group
+
+    Parameters
+    ----------
+    order : int, optional
+        box width of the boards it will be applied to, by default 3
+    rng : random.Random, optional
+        source of randomness, by default the random module
+    symbols : Sequence[Cell], optional
+        the order * order clue symbols of those boards, such as the letter placeholders of a
+        template, by default the ints 1 to order * order
+
+    Returns
+    -------
+    Transform
+        relabels symbols to the ints 1 to order * order in a random order
+    """
+    if rng is None:
+        rng = random  # type: ignore
+    size = order * order
+
+    def line_order() -> Tuple[int, ...]:
+        groups = list(range(order))
+        rng.shuffle(groups)
+        ret: List[int] = []
+        for g in groups:
+            inside = list(range(g * order, (g + 1) * order))
+            rng.shuffle(inside)
+            ret.extend(inside)
+        return tuple(ret)
+
+    values = list(range(1, size + 1))
+    rng.shuffle(values)
+    return Transform(
+        rng.random() < 0.5,
+        line_order(),
+        line_order(),
+        dict(zip(range(1, size + 1) if symbols is None else symbols, values)),
+    )
+
+
+def _min_col_perms(
+    row: Sequence[Cell], order: int, empty: Set[int]
+) -> Tuple[Tuple[int, ...], Iterator[Tuple[int, ...]]]:
+    """Column orders that make row smallest once it is relabeled
+
+    A row of a valid board never repeats a clue, so relabeling in order of appearance always
+    turns its clues into 1, 2, 3, ... and only where the blanks end up matters.
+    The smallest row puts the stacks with the most blanks first and blanks first in each stack.
+    The columns in empty are blank all the way down and can swap places without changing the
+    board, so only the orders keeping them in increasing order are given, and the same for
+    stacks made of nothing but empty columns.
+
+    Returns
+    -------
+    Tuple[Tuple[int, ...], Iterator[Tuple[int, ...]]]
+        the blank pattern, 0 for a blank and 1 for a clue, and the column orders giving it
+    """
+    stacks = [tuple(range(s * order, (s + 1) * order)) for s in range(order)]
+    blanks = [sum(1 for c in st if row[c] == 0) for st in stacks]
+    counts = sorted(set(blanks), reverse=True)
+    pattern: List[int] = []
+    for z in sorted(blanks, reverse=True):
+        pattern.extend([0] * z + [1] * (order - z))
+
+    def in_order(cols: Iterable[int]) -> bool:
+        last = -1
+        for c in cols:
+            if c in empty:
+                if c < last:
+                    return False
+                last = c
+        return True
+
+    # orders of the stacks, stacks with equal blanks can go either way round
+    groups = []
+    for z in counts:
+        group = [s for s in range(order) if blanks[s] == z]
+        bare = [s for s in group if all(c in empty for c in stacks[s])]
+        groups.append(
+            [g for g in permutations(group) if [s for s in g if s in bare] == bare]
+        )
+    # orders of the columns inside each stack, blanks first
+    inside = []
+    for st in stacks:
+        blank = [c for c in st if row[c] == 0]
+        full = [c for c in st if row[c] != 0]
+        inside.append(
+            [
+                e + f
+                for e in permutations(blank)
+                if in_order(e)
+                for f in permutations(full)
+            ]
+        )
+
+    def perms() -> Iterator[Tuple[int, ...]]:
+        for choice in product(*groups):
+            stack_order = sum(choice, ())
+            for cols in product(*(inside[s] for s in stack_order)):
+                yield sum(cols, ())
+
+    return tuple(pattern), perms()
+
+
+def _lead_rows(
+    grid: Sequence[Sequence[Cell]], rows: Iterable[int], order: int
+) -> List[int]:
+    """The rows that can come next, leaving out empty rows that are the same as one kept
+
+    Empty rows of one band can swap places, so only the first of them is kept, and only the
+    first band of those that are empty all through.
+    """
+    kept = []
+    bands = set()
+    empty_band = False
+    for r in rows:
+        band = r // order
+        if any(grid[r]):
+            kept.append(r)
+        elif band not in bands:
+            bands.add(band)
+            rest = range(band * order, (band + 1) * order)
+            if all(not any(grid[i]) for i in rest):
+                if empty_band:
+                    continue
+                empty_band = True
+            kept.append(r)
+    return kept
+
+
+def canonicalize(
+    board: Sequence[Sequence[Cell]],
+) -> Tuple[Tuple[int, ...], Transform]:
+    """Find the representative of board's symmetry class and the transform that reaches it
+
+    The symmetry class is every board reachable by relabeling the clues, permuting rows inside
+    a band, columns inside a stack, bands, stacks, and transposing. The representative is the
+    smallest of them read row by row, with clues relabeled 1, 2, 3, ... in order of appearance.
+    Rows are chosen one at a time and only the orderings that keep the smallest prefix are
+    carried on to the next row. Orderings that only swap empty rows or columns are the same
+    board, one of them is carried for all.
+
+    At most MAX_STATES orderings are carried, a board with more ties than that, such as a
+    sparse 25x25 board, keeps the first ones. Its form is still the board seen through
+    a symmetry, so boards with equal forms are always in one class, but other boards of its
+    class may get a different form.
+
+    Parameters
+    ----------
+    board : Sequence[Sequence[int | str]]
+        a valid board, 0 for blanks and ints or letter placeholders for clues
+
+    Returns
+    -------
+    Tuple[Tuple[int, ...], Transform]
+        the canonical board flattened row by row, and the transform with
+        transform.apply(board) equal to it
+    """
+    size = len(board)
+    order = board_order(board)
+    grids = (tuple(map(tuple, board)), tuple(zip(*board)))
+    # columns of each grid that are blank all the way down
+    empties = [{c for c in range(size) if not any(grids[1 - t][c])} for t in range(2)]
+
+    # first row, every row of either grid can lead as long as its band comes first
+    best = None
+    states = []
+    for t, grid in enumerate(grids):
+        for r in _lead_rows(grid, range(size), order):
+            pattern, perms = _min_col_perms(grid[r], order, empties[t])
+            if best is None or pattern < best:
+                best, states = pattern, []
+            if pattern == best:
+                for cols in islice(perms, MAX_STATES - len(states)):
+                    labels: Dict[Hashable, int] = {}
+                    for c in cols:
+                        if grid[r][c] != 0:
+                            labels[grid[r][c]] = len(labels) + 1
+                    states.append((t, (r,), cols, labels))
+
+    for depth in range(1, size):
+        best = None
+        next_states = []
+        for t, rows, cols, labels in states:
+            grid = grids[t]
+            band = rows[-1] // order
+            if depth % order:
+                # finish the band that is in progress
+                choices = [
+                    r for r in range(band * order, (band + 1) * order) if r not in rows
+                ]
+            else:
+                used = {r // order for r in rows}
+                choices = [r for r in range(size) if r // order not in used]
+            for r in _lead_rows(grid, choices, order):
+                new = labels
+                line = []
+                for c in cols:
+                    v = grid[r][c]
+                    if v == 0:
+                        line.append(0)
+                        continue
+                    if v not in new:
+                        if new is labels:
+                            new = dict(labels)
+                        new[v] = len(new) + 1
+                    line.append(new[v])
+                line = tuple(line)
+                if best is None or line < best:
+                    best, next_states = line, []
+                if line == best and len(next_states) < MAX_STATES:
+                    next_states.append((t, rows + (r,), cols, new))
+        states = next_states
+
+    t, rows, cols, labels = states[0]
+    # give symbols that never appear the remaining labels so the transform is a full relabeling
+    symbols = (
+        [chr(ord("a") + i) for i in range(size)]
+        if any(isinstance(k, str) for k in labels)
+        else list(range(1, size + 1))
+    )
+    free = iter(sorted(set(range(1, size + 1)) - set(labels.values())))
+    labels = dict(labels)
+    for s in symbols:
+        if s not in labels:
+            labels[s] = next(free)
+    transform = Transform(bool(t), rows, cols, labels)
+    form = tuple(v for row in transform.apply(board) for v in row)
+    return form, transform
+
+
+def canonical_form(board: Sequence[Sequence[Cell]]) -> Tuple[int, ...]:
+    """The representative of board's symmetry class flattened row by row, see canonicalize"""
+    return canonicalize(board)[0]
+
+
+def canonical_hash(board: Sequence[Sequence[Cell]]) -> str:
+    """A short stable hash of the canonical form, equal for every board in a symmetry class
+
+    Parameters
+    ----------
+    board : Sequence[Sequence[int | str]]
+
+    Returns
+    -------
+    str
+        32 hex characters
+    """
+    return hashlib.blake2b(bytes(canonical_form(board)), digest_size=16).hexdigest()
+
+
+def unique_boards(
+    boards: Iterable[Sequence[Sequence[Cell]]], seen: Set[Tuple[int, ...]] = None
+) -> Iterator[Sequence[Sequence[Cell]]]:
+    """Lazily drop boards that are in the same symmetry class as an earlier one
+
+    Parameters
+    ----------
+    boards : Iterable[Sequence[Sequence[int | str]]]
+    seen : Set[Tuple[int, ...]], optional
+        canonical forms already seen, updated in place, by default a new set
+
+    Yields
+    ------
+    Sequence[Sequence[int | str]]
+        the first board of each symmetry class
+    """
+    if seen is None:
+        seen = set()
+    for board in boards:
+        key = canonical_form(board)
+        if key not in seen:
+            seen.add(key)
+            yield board